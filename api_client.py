@@ -7,16 +7,50 @@ based on environment variables and available dependencies.
 """
 import os
 import logging
-import platform
-import importlib.util
+import functools
 from typing import Dict, List, Any, Optional, Union
 
 # Get module logger
 logger = logging.getLogger('dns_updater.api')
 
+# Backend modules (and requests/urllib3/subprocess behind them) are only
+# imported when a client is actually created, to keep startup cheap
+_LAZY_ATTRIBUTES = {
+    'OPNsenseAPICore': 'api_client_core',
+    'ConnectionConfig': 'api_client_core',
+    'OPNsenseAPICurl': 'api_client_alt',
+}
+
+def __getattr__(name):
+    """Resolve backend classes on first access instead of at import time."""
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+# Module providing each registered backend; importing it runs the
+# @register_backend decorator that adds the class to the registry
+_BACKEND_MODULES = {
+    'httpx': 'api_client_httpx',
+    'curl': 'api_client_alt',
+    'requests': 'api_client_requests',
+    'core': 'api_client_core',
+}
+
+def _load_backend(name: str):
+    """Import a backend module on first use and return its registered class."""
+    import importlib
+    importlib.import_module(_BACKEND_MODULES[name])
+    from api_client_core import BACKENDS
+    return BACKENDS[name]
+
 # First check if required modules exist before attempting imports
 def check_module_exists(module_name):
     """Check if a module exists in the current environment."""
+    import importlib.util
     return importlib.util.find_spec(module_name) is not None
 
 # Check for direct IP configuration - set this up early
@@ -40,60 +74,74 @@ if direct_ip:
     logger.info("Disabling SSL verification due to direct IP usage")
     os.environ['VERIFY_SSL'] = 'false'
 
-# Detect TrueNAS Scale specifically
-is_truenas = False
-try:
-    with open('/etc/os-release', 'r') as f:
-        os_release_content = f.read()
-        if 'truenas' in os_release_content.lower():
-            is_truenas = True
-            logger.info("TrueNAS Scale detected, optimizing API client")
-except Exception:
-    pass
+@functools.lru_cache(maxsize=1)
+def _detect_truenas() -> bool:
+    """Detect TrueNAS Scale specifically (read /etc/os-release once)."""
+    try:
+        with open('/etc/os-release', 'r') as f:
+            if 'truenas' in f.read().lower():
+                logger.info("TrueNAS Scale detected, optimizing API client")
+                return True
+    except Exception:
+        pass
+    return False
+
+is_truenas = _detect_truenas()
 
-def create_api_client(base_url, key, secret):
-    """Create the appropriate API client implementation."""
-    # Start with checking environment variable preferences
+# Implementation preferences, read once per process
+_USE_CURL_FIRST_ENV = os.environ.get('USE_CURL_FIRST', 'auto').lower()
+# Keeping the per-call curl client after the probe is a debug mode only
+_FORCE_CURL = os.environ.get('FORCE_CURL', 'false').lower() in ('true', 'yes', '1')
+if 'STAY_WITH_CURL' in os.environ:
+    logger.warning("STAY_WITH_CURL is no longer supported; set FORCE_CURL=1 to keep the curl client")
+
+# Outcome of the initial connection probe per (base_url, key prefix):
+# 'curl' when FORCE_CURL keeps the curl client, 'requests' for the factory's choice
+_PROBE_CACHE: Dict[tuple, str] = {}
+
+def _select_implementation() -> List[str]:
+    """Return backend names to try, in order of preference."""
     use_curl = os.environ.get('USE_CURL', 'false').lower() == 'true'
+    # USE_HTTP2 is accepted as an alias, since HTTP/2 is why httpx is used
+    use_httpx = any(os.environ.get(name, 'false').lower() == 'true' for name in ('USE_HTTPX', 'USE_HTTP2'))
+    
+    candidates = []
+    if use_curl:
+        candidates.append('curl')
+    elif use_httpx:
+        candidates.append('httpx')
+    
+    # Fall back to requests, then the minimal core implementation
+    candidates.extend(['requests', 'core'])
+    return candidates
 
+def create_api_client(base_url, key, secret):
+    """Create the appropriate API client implementation."""
     # Check if requests is available
     has_requests = check_module_exists('requests')
     if not has_requests:
         logger.error("Required 'requests' module not available")
         raise ImportError("Cannot create API client: 'requests' module not available")
     
-    if use_curl:
-        # Try to directly import the curl implementation
+    last_error = None
+    for name in _select_implementation():
         try:
-            # Import the underlying OPNsenseAPICore first
-            from api_client_core import OPNsenseAPICore, ConnectionConfig
-            # Then try to import the curl implementation
-            from api_client_alt import OPNsenseAPICurl
-            logger.info("Using curl implementation as configured")
-            return OPNsenseAPICurl(base_url, key, secret)
+            backend = _load_backend(name)
+            client = backend(base_url, key, secret)
         except ImportError as e:
-            logger.warning(f"Curl implementation not available: {e}, falling back")
-    
-    # Try to use the requests implementation
-    try:
-        # Explicitly import from a module file in the current directory
-        from api_client_requests import OPNsenseAPI
-        logger.info("Using requests implementation")
-        return OPNsenseAPI(base_url, key, secret)
-    except ImportError as e:
-        logger.warning(f"Requests implementation not available: {e}")
+            # httpx also raises ImportError here when h2 is missing
+            logger.warning(f"{name} implementation not available: {e}, falling back")
+            last_error = e
+            continue
+        
+        if name == 'core':
+            logger.warning("Using core API client with minimal functionality")
+        else:
+            logger.info(f"Using {name} implementation")
+        return client
     
-    # If all else fails, use the base implementation with minimal functionality
-    try:
-        # Make sure required modules are imported
-        import requests
-        # Correctly import ConnectionConfig (not APIConfig)
-        from api_client_core import OPNsenseAPICore, ConnectionConfig
-        logger.warning("Using core API client with minimal functionality")
-        return OPNsenseAPICore(base_url, key, secret)
-    except ImportError as e:
-        logger.error(f"Core API client import failed: {e}")
-        raise ImportError(f"Cannot create API client: {e}")
+    logger.error(f"Core API client import failed: {last_error}")
+    raise ImportError(f"Cannot create API client: {last_error}")
 
 # The main OPNsenseAPI class that will be used by applications
 class OPNsenseAPI:
@@ -105,24 +153,38 @@ class OPNsenseAPI:
     """
     def __init__(self, base_url: str, key: str, secret: str):
         """Initialize the OPNsense API client with credentials."""
-        # Start with curl on TrueNAS Scale to avoid initial connection issues
-        use_curl_first = os.environ.get('USE_CURL_FIRST', 'auto').lower()
-        
-        if use_curl_first == 'auto':
-            use_curl_first = is_truenas
-        else:
-            use_curl_first = use_curl_first in ('true', 'yes', '1')
+        self._probe_key = (base_url, key[:8])
         
         # Create the client implementation
         self._implementation = None
         
-        # Try to directly import OPNsenseAPICurl for initial connection if configured
-        curl_implementation = None
+        cached_choice = _PROBE_CACHE.get(self._probe_key)
+        if cached_choice == 'curl':
+            logger.info("Using curl implementation from earlier connection probe")
+            self._implementation = _load_backend('curl')(base_url, key, secret)
+        elif cached_choice == 'requests':
+            logger.debug("Skipping curl probe, using cached implementation choice")
+            self._implementation = create_api_client(base_url, key, secret)
+        else:
+            self._implementation = self._probe_and_create(base_url, key, secret)
+            
+        logger.info(f"OPNsense API client wrapper initialized")
+    
+    def _probe_and_create(self, base_url: str, key: str, secret: str):
+        """Run the optional curl probe and create the implementation to use."""
+        # Start with curl on TrueNAS Scale to avoid initial connection issues
+        if _USE_CURL_FIRST_ENV == 'auto':
+            use_curl_first = is_truenas
+        else:
+            use_curl_first = _USE_CURL_FIRST_ENV in ('true', 'yes', '1')
+        
+        # Curl is only used to establish the first connection; afterwards all
+        # traffic goes through the pooled implementation from the factory
         if use_curl_first:
             try:
-                from api_client_alt import OPNsenseAPICurl
+                curl_class = _load_backend('curl')
                 logger.info("Starting with curl implementation for first connection")
-                curl_implementation = OPNsenseAPICurl(base_url, key, secret)
+                curl_implementation = curl_class(base_url, key, secret)
                 
                 # Test connection with curl first
                 try:
@@ -130,27 +192,38 @@ class OPNsenseAPI:
                     result = curl_implementation.get("core/firmware/status")
                     if "product_version" in result:
                         logger.info(f"Curl connection successful: OPNsense {result.get('product_version', 'unknown')}")
-                        self._implementation = curl_implementation
+                        
+                        # Debug escape hatch: keep the curl client for all calls
+                        if _FORCE_CURL:
+                            logger.info("Keeping curl implementation as forced by FORCE_CURL")
+                            _PROBE_CACHE[self._probe_key] = 'curl'
+                            return curl_implementation
                     else:
                         logger.warning("Curl connection returned unexpected response")
                 except Exception as e:
                     logger.error(f"Initial curl connection failed: {e}, falling back to standard client")
+                
+                curl_implementation.close()
+                del curl_implementation
             except ImportError as e:
                 logger.warning(f"Curl implementation not available for initial connection: {e}")
         
-        # If curl was successful and we should stay with it
-        if self._implementation is not None and os.environ.get('STAY_WITH_CURL', 'false').lower() == 'true':
-            logger.info("Staying with curl implementation as configured")
-        else:
-            # Create standard implementation
-            self._implementation = create_api_client(base_url, key, secret)
-            
-        logger.info(f"OPNsense API client wrapper initialized")
+        # Create standard implementation
+        _PROBE_CACHE[self._probe_key] = 'requests'
+        return create_api_client(base_url, key, secret)
+    
+    def _track_connection(self, result: Dict) -> Dict:
+        """Forget the cached probe result once the connection is lost."""
+        if (isinstance(result, dict) and result.get('status') == 'error'
+                and not getattr(self._implementation, 'is_connected', True)):
+            if _PROBE_CACHE.pop(self._probe_key, None) is not None:
+                logger.info("Connection lost, next client will re-run the connection probe")
+        return result
     
     def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
         """Make a GET request to the OPNsense API."""
-        return self._implementation.get(endpoint, params)
+        return self._track_connection(self._implementation.get(endpoint, params))
     
     def post(self, endpoint: str, data: Any = None) -> Dict:
         """Make a POST request to the OPNsense API."""
-        return self._implementation.post(endpoint, data)
+        return self._track_connection(self._implementation.post(endpoint, data))
@@ -2,130 +2,329 @@
 """
 Alternative implementation methods for the OPNsense API client.
 """
-import os
 import time
 import logging
 import json
-import re  # Added missing import
+import functools
+import shutil
 import subprocess
-from typing import Dict, List, Any, Optional, Union
+import threading
+from io import BytesIO
+from urllib.parse import quote, urlencode
+from typing import Dict, List, Any, Optional, Tuple, Union
 
+# pycurl keeps one libcurl handle (and its connection/TLS session) alive
+# in-process; without it we fall back to spawning the curl binary per call
+try:
+    import pycurl
+except ImportError:
+    pycurl = None
 
-from api_client_core import OPNsenseAPICore
+from api_client_core import OPNsenseAPICore, dumps_json, loads_json, register_backend, resolve_cached
 
 # Get module logger
 logger = logging.getLogger('dns_updater.api')
 
+# Substrings of JSON field names whose values are redacted in debug logs
+SENSITIVE_KEY_PARTS = frozenset({'pass', 'secret', 'key', 'token', 'auth'})
+
+# Body for empty POSTs (reconfigure, delete), sent without serializing
+_EMPTY_JSON = b"{}"
+
+def _etag_from_headers(lines) -> Optional[str]:
+    """Return the ETag value from raw response header lines, if present."""
+    for line in lines:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"etag":
+            return value.strip().decode('latin-1')
+    return None
+
+@register_backend('curl')
 class OPNsenseAPICurl(OPNsenseAPICore):
     """
-    OPNsense API client implementation using curl subprocess.
+    OPNsense API client implementation using libcurl.
     
     This implementation is a fallback for systems where the requests
-    library has connectivity issues.
+    library has connectivity issues. It uses a persistent pycurl handle
+    when pycurl is installed and a curl subprocess per call otherwise.
     """
+    # Mirror the curl CLI's "--retry 3 --retry-delay 2" behaviour for pycurl
+    PYCURL_RETRIES = 3
+    PYCURL_RETRY_DELAY = 2
+    
+    # Constant curl arguments for POST requests; the JSON body is written to
+    # curl's stdin so it never has to fit on the command line
+    CURL_POST_ARGS = ("-H", "Content-Type: application/json", "--data-binary", "@-")
+    
     def __init__(self, base_url: str, key: str, secret: str):
         """Initialize the OPNsense API client with credentials."""
         super().__init__(base_url, key, secret)
         
-        # Check if curl is available
-        self._check_curl()
-        logger.info(f"Curl-based API client initialized")
+        # Pre-encoded auth header lists for the pycurl handle
+        self._get_headers = [f"Authorization: {self.auth_header}"]
+        self._post_headers = self._get_headers + ["Content-Type: application/json"]
+        
+        # Timeouts only depend on whether the URL is an Unbound service call,
+        # so compute both variants (and their curl -m strings) once
+        self._timeouts = (self._compute_timeouts(False), self._compute_timeouts(True))
+        self._max_time_args = tuple(str(max_timeout) for _, max_timeout in self._timeouts)
+        
+        # Located once with a PATH scan rather than running curl --version
+        self._curl_path = shutil.which("curl")
+        
+        # The same endpoints are requested every sync cycle
+        self._endpoint_url = functools.lru_cache(maxsize=128)(self._join_url)
+        
+        # Parsed GET responses with their ETag, shared with the requests
+        # client through the DNS cache: "etag:<url>" -> (result, etag)
+        from cache_manager import get_cache
+        self._response_cache = get_cache()
+        
+        # Fixed part of the curl command line for the subprocess fallback
+        self._curl_base = self._build_curl_base()
+        # Position of the key:secret argument, for log redaction
+        self._auth_index = self._curl_base.index("-u") + 1
+        
+        self._curl = None
+        # A pycurl handle must not be used by two threads at once
+        self._curl_lock = threading.Lock()
+        if pycurl is not None:
+            self._curl = self._create_curl_handle()
+            logger.info(f"Curl-based API client initialized (pycurl {pycurl.version})")
+        else:
+            # Check if curl is available
+            self._check_curl()
+            logger.info(f"Curl-based API client initialized (subprocess)")
+    
+    def _build_curl_base(self) -> Tuple[str, ...]:
+        """Build the curl arguments that are identical for every request."""
+        return (
+            self._curl_path or "curl", "-s",
+            # Use reasonable timeouts for better reliability (cap at 10 seconds)
+            "--connect-timeout", str(min(10, self.config.connect_timeout)),
+            # Retry 3 times, 2 seconds apart, for at most 60 seconds, on all
+            # errors - not just transient ones
+            "--retry", "3",
+            "--retry-delay", "2",
+            "--retry-max-time", "60",
+            "--retry-all-errors",
+            # Add authentication
+            "-u", f"{self.auth[0]}:{self.auth[1]}",
+            # Add SSL options
+            *(("-k",) if not self.config.verify_ssl else ()),
+            # Force HTTP/1.1 if configured
+            *(("--http1.1",) if self.config.force_http1 else ())
+        )
+    
+    def _create_curl_handle(self):
+        """Create a reusable libcurl handle with per-client options set once."""
+        curl = pycurl.Curl()
+        curl.setopt(pycurl.HTTPHEADER, self._get_headers)
+        curl.setopt(pycurl.CONNECTTIMEOUT, min(10, self.config.connect_timeout))
+        curl.setopt(pycurl.NOSIGNAL, 1)
+        
+        # Keep the connection (and TLS session) alive between calls
+        curl.setopt(pycurl.FORBID_REUSE, 0)
+        curl.setopt(pycurl.FRESH_CONNECT, 0)
+        
+        # Add SSL options
+        if not self.config.verify_ssl:
+            curl.setopt(pycurl.SSL_VERIFYPEER, 0)
+            curl.setopt(pycurl.SSL_VERIFYHOST, 0)
+            
+        # Force HTTP/1.1 if configured
+        if self.config.force_http1:
+            curl.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_1_1)
+            
+        return curl
+    
+    def close(self) -> None:
+        """Close the persistent pycurl handle, if any."""
+        with self._curl_lock:
+            if self._curl is not None:
+                self._curl.close()
+                self._curl = None
     
     def _check_curl(self) -> bool:
         """Check if curl is available on the system."""
-        try:
-            result = subprocess.run(
-                ["curl", "--version"], 
-                capture_output=True, 
-                text=True, 
-                timeout=5
-            )
-            if result.returncode == 0:
-                logger.info(f"Found curl: {result.stdout.splitlines()[0]}")
-                return True
-            else:
-                logger.warning("Curl command returned non-zero exit code")
-                return False
-        except (subprocess.SubprocessError, FileNotFoundError) as e:
-            logger.error(f"Curl not available: {e}")
-            return False
+        if self._curl_path:
+            logger.info(f"Found curl: {self._curl_path}")
+            return True
+        logger.error("Curl not available: not found on PATH")
+        return False
+    
+    def _build_url(self, endpoint: str, params: Optional[Dict] = None) -> str:
+        """Build the request URL with params if provided."""
+        if not params:
+            return self._endpoint_url(endpoint)
+        # Percent-encode spaces as %20 like curl and browsers, not '+'
+        return f"{self._endpoint_url(endpoint)}?{urlencode(params, doseq=True, quote_via=quote)}"
     
     def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
         """Make a GET request to the OPNsense API using curl."""
         self._rate_limit()
+        url = self._build_url(endpoint, params)
+        
+        # Revalidate a cached response instead of downloading it again
+        cache_key = f"etag:{url}"
+        cached = self._response_cache.get(cache_key)
+        result, etag = self._curl_request("GET", url, if_none_match=cached[1] if cached else None)
         
-        # Build URL with params if provided
-        url = f"{self.base_url}/{endpoint}"
-        if params:
-            # Simple URL param encoding
-            param_str = "&".join(f"{k}={v}" for k, v in params.items())
-            url = f"{url}?{param_str}"
+        if result is None:
+            logger.debug("GET %s not modified, using cached response", url)
+            self.is_connected = True
+            self.connection_errors = 0
+            # Still current, so keep it for another TTL
+            self._response_cache.set(cache_key, cached)
+            return cached[0]
         
-        return self._curl_request("GET", url)
+        if etag and not (isinstance(result, dict) and result.get('status') == 'error'):
+            self._response_cache.set(cache_key, (result, etag))
+        return result
     
     def post(self, endpoint: str, data: Any = None) -> Dict:
         """Make a POST request to the OPNsense API using curl."""
         self._rate_limit()
-        url = f"{self.base_url}/{endpoint}"
-        return self._curl_request("POST", url, data)
+        result, _ = self._curl_request("POST", self._build_url(endpoint), data)
+        return result
     
-    def _curl_request(self, method: str, url: str, data: Any = None) -> Dict:
-        """Make a request using curl subprocess with credential redaction."""
-        # Build curl command
-        cmd = ["curl", "-s"]
-        
-        # Add method
-        cmd.extend(["-X", method])
+    def _curl_request(self, method: str, url: str, data: Any = None,
+                      if_none_match: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Make a request using libcurl with credential redaction.
         
+        Returns the parsed result and the ETag of a successful response. If
+        if_none_match is given and the server answers 304, the result is None.
+        """
+        if self._curl is not None:
+            with self._curl_lock:
+                return self._pycurl_request(method, url, data, if_none_match)
+        return self._subprocess_request(method, url, data, if_none_match)
+    
+    def _compute_timeouts(self, unbound_service: bool) -> Tuple[int, int]:
+        """Return (connect_timeout, max_timeout) in seconds for a request."""
         # Use reasonable timeouts for better reliability
         connect_timeout = min(10, self.config.connect_timeout)  # Cap at 10 seconds
         operation_timeout = min(20, self.config.read_timeout)   # Cap at 20 seconds
         
-        # Add timeout options 
-        cmd.extend(["--connect-timeout", str(connect_timeout)])
-        
         # Calculate timeout - add adaptive timeout for Unbound operations
-        if "unbound/service/" in url:
+        if unbound_service:
             # Unbound service operations need more time
             operation_timeout = max(45, operation_timeout)  # At least 45 seconds for Unbound operations
         
         # Set the max-time option with a reasonable upper limit
-        max_timeout = connect_timeout + operation_timeout
-        cmd.extend(["-m", str(max_timeout)])
-        
-        # Add retry options with appropriate timing
-        cmd.extend(["--retry", "3"])  # 3 retries
-        cmd.extend(["--retry-delay", "2"])  # 2 seconds between retries
-        cmd.extend(["--retry-max-time", "60"])  # Give up after 60 seconds of retries
-        # Add crucial option for retry on all errors - not just transient ones
-        cmd.extend(["--retry-all-errors"])
+        return connect_timeout, connect_timeout + operation_timeout
     
-        # Add authentication
-        cmd.extend(["-u", f"{self.auth[0]}:{self.auth[1]}"])
+    def _request_timeouts(self, url: str) -> Tuple[int, int]:
+        """Return the precomputed (connect_timeout, max_timeout) for a URL."""
+        return self._timeouts["unbound/service/" in url]
+    
+    def _pycurl_request(self, method: str, url: str, data: Any = None,
+                        if_none_match: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """Make a request on the persistent pycurl handle."""
+        _, max_timeout = self._request_timeouts(url)
+        
+        # Only the per-request options change; auth, SSL and keep-alive
+        # settings were applied once when the handle was created
+        curl = self._curl
+        curl.setopt(pycurl.URL, url)
+        curl.setopt(pycurl.CUSTOMREQUEST, method)
+        curl.setopt(pycurl.TIMEOUT, max_timeout)
         
-        # Add SSL options
-        if not self.config.verify_ssl:
-            cmd.append("-k")
-            
-        # Force HTTP/1.1 if configured
-        if self.config.force_http1:
-            cmd.append("--http1.1")
-            
-        # For POST requests, handle data or empty request
         if method.upper() == "POST":
-            cmd.extend(["-H", "Content-Type: application/json"])
-            if data is None:
-                # For empty POST, add empty JSON object
-                cmd.extend(["-d", "{}"])
-            else:
-                cmd.extend(["-d", json.dumps(data)])
+            curl.setopt(pycurl.HTTPHEADER, self._post_headers)
+            # For empty POST, send an empty JSON object
+            curl.setopt(pycurl.POSTFIELDS, _EMPTY_JSON if data is None or data == {} else dumps_json(data))
+        else:
+            curl.setopt(pycurl.HTTPGET, 1)
+            curl.setopt(pycurl.HTTPHEADER, self._get_headers + [f"If-None-Match: {if_none_match}"]
+                        if if_none_match else self._get_headers)
+        
+        start_time = time.time()
+        for attempt in range(self.PYCURL_RETRIES + 1):
+            buffer = BytesIO()
+            header_lines = []
+            curl.setopt(pycurl.WRITEDATA, buffer)
+            curl.setopt(pycurl.HEADERFUNCTION, header_lines.append)
+            try:
+                curl.perform()
+                break
+            except pycurl.error as e:
+                if attempt < self.PYCURL_RETRIES:
+                    logger.debug("curl attempt %d failed: %s", attempt + 1, e)
+                    time.sleep(self.PYCURL_RETRY_DELAY)
+                    continue
                 
-        # Add URL
-        cmd.append(url)
+                # Redact any credentials that might appear in the error
+                code = e.args[0] if e.args else -1
+                safe_error = self._redact_sensitive_data(e.args[1] if len(e.args) > 1 else str(e))
+                logger.error("curl failed with code %s: %s", code, safe_error)
+                return {"status": "error", "message": safe_error or "Unknown curl error"}, None
+        
+        logger.debug("curl request completed in %.2fs", time.time() - start_time)
+        
+        status = curl.getinfo(pycurl.RESPONSE_CODE)
+        if status == 304 and if_none_match:
+            return None, if_none_match
+        etag = _etag_from_headers(header_lines) if status == 200 else None
+        return self._parse_json_body(buffer.getvalue()), etag
+    
+    def _parse_json_body(self, body: Union[str, bytes]) -> Dict:
+        """Parse a JSON response body and update connection state."""
+        try:
+            response_data = loads_json(body)
+            self.connection_errors = 0
+            self.is_connected = True
+            return response_data
+        except ValueError:
+            # Credentials in the snippet are redacted by the log filter
+            snippet = body[:100]
+            if isinstance(snippet, bytes):
+                snippet = snippet.decode('utf-8', 'replace')
+            logger.warning("Invalid JSON response: %s", snippet)
+            return {"status": "error", "message": "Invalid JSON response"}
+    
+    def _resolve_args(self) -> Tuple[str, ...]:
+        """Return curl --resolve arguments pinning the API host to its cached IP."""
+        if self._api_host is None:
+            return ()
+        ip = resolve_cached(self._api_host, self._api_port, self.config.dns_cache_ttl)
+        if ip is None:
+            # Let curl resolve the name itself
+            return ()
+        if ':' in ip:
+            ip = f"[{ip}]"
+        # --resolve keeps the hostname in the URL, so SNI and certificate
+        # checks are unaffected
+        return ("--resolve", f"{self._api_host}:{self._api_port}:{ip}")
     
-        # Create redacted version of command for logging
-        safe_cmd = self._redact_command(cmd)
-        logger.debug(f"curl command: {' '.join(safe_cmd)}")
+    def _subprocess_request(self, method: str, url: str, data: Any = None,
+                            if_none_match: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """Make a request using curl subprocess with credential redaction."""
+        unbound_service = "unbound/service/" in url
+        _, max_timeout = self._timeouts[unbound_service]
+        
+        # Only the method, max-time, body and URL vary per request
+        base = (*self._curl_base, *self._resolve_args(), "-X", method, "-m",
+                self._max_time_args[unbound_service])
+        body = None
+        if method.upper() != "POST":
+            # Dump the response headers ahead of the body for the ETag
+            cmd = [*base, "-D", "-"]
+            if if_none_match:
+                cmd += ["-H", f"If-None-Match: {if_none_match}"]
+            cmd.append(url)
+        else:
+            # For empty POST, send an empty JSON object
+            body = _EMPTY_JSON if data is None or data == {} else dumps_json(data)
+            cmd = [*base, *self.CURL_POST_ARGS, url]
+    
+        # Create redacted version of command only if it will be logged
+        if logger.isEnabledFor(logging.DEBUG):
+            safe_cmd = self._redact_command(cmd)
+            logger.debug("curl command: %s", ' '.join(safe_cmd))
+            if body is not None:
+                logger.debug("curl request body: %s", self._redact_body(body))
         
         # Execute command with custom timeout enforcement
         try:
@@ -134,96 +333,82 @@ class OPNsenseAPICurl(OPNsenseAPICore):
             # Add a safety margin to the timeout
             timeout_with_margin = max_timeout + 10
             
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                timeout=timeout_with_margin
-            )
+            # Keep stdout as bytes: the JSON parser accepts them directly,
+            # which saves decoding a potentially large body to str first
+            with subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE if body is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            ) as proc:
+                try:
+                    stdout, stderr = proc.communicate(input=body, timeout=timeout_with_margin)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.communicate()
+                    raise
             elapsed = time.time() - start_time
             
-            if result.returncode != 0:
+            if proc.returncode != 0:
                 # Redact any credentials that might appear in error output
-                safe_stderr = self._redact_sensitive_data(result.stderr)
-                logger.error(f"curl failed with code {result.returncode}: {safe_stderr}")
-                return {"status": "error", "message": safe_stderr or "Unknown curl error"}
+                stderr_tail = stderr[-512:].decode('utf-8', 'replace')
+                safe_stderr = self._redact_sensitive_data(stderr_tail)
+                logger.error("curl failed with code %s: %s", proc.returncode, safe_stderr)
+                return {"status": "error", "message": safe_stderr or "Unknown curl error"}, None
                 
-            logger.debug(f"curl request completed in {elapsed:.2f}s")
+            logger.debug("curl request completed in %.2fs", elapsed)
+            
+            etag = None
+            if body is None:
+                status, etag, stdout = self._split_headers(stdout)
+                if status == 304 and if_none_match:
+                    return None, if_none_match
+                if status != 200:
+                    etag = None
             
             # Try to parse JSON response
-            try:
-                response_data = json.loads(result.stdout)
-                self.connection_errors = 0
-                self.is_connected = True
-                return response_data
-            except json.JSONDecodeError:
-                # Redact any potential credentials in response
-                safe_stdout = self._redact_sensitive_data(result.stdout[:100])
-                logger.warning(f"Invalid JSON response: {safe_stdout}")
-                return {"status": "error", "message": "Invalid JSON response"}
+            return self._parse_json_body(stdout), etag
                     
         except subprocess.TimeoutExpired:
             elapsed = time.time() - start_time
-            logger.error(f"curl command timed out after {elapsed:.2f}s (timeout set to {timeout_with_margin}s)")
-            return {"status": "error", "message": f"Command timed out after {elapsed:.2f} seconds"}
+            logger.error("curl command timed out after %.2fs (timeout set to %ss)", elapsed, timeout_with_margin)
+            return {"status": "error", "message": f"Command timed out after {elapsed:.2f} seconds"}, None
         except (subprocess.SubprocessError, FileNotFoundError) as e:
             error_msg = str(e)
             safe_error = self._redact_sensitive_data(error_msg)
-            return self._handle_error(Exception(safe_error), method, url)
+            return self._handle_error(Exception(safe_error), method, url), None
+    
+    @staticmethod
+    def _split_headers(output: bytes) -> Tuple[int, Optional[str], bytes]:
+        """Split curl -D - output into (status, etag, body), using the last header block."""
+        status, etag = 0, None
+        # Interim responses and retried attempts each add a header block
+        while output.startswith(b"HTTP/"):
+            head, _, output = output.partition(b"\r\n\r\n")
+            lines = head.split(b"\r\n")
+            status_line = lines[0].split()
+            status = int(status_line[1]) if len(status_line) > 1 and status_line[1].isdigit() else 0
+            etag = _etag_from_headers(lines[1:])
+        return status, etag, output
     
     def _redact_command(self, cmd: List[str]) -> List[str]:
         """Create a safe version of a command for logging by redacting credentials."""
         safe_cmd = cmd.copy()
-        
-        # Find and redact auth information
-        try:
-            for i, arg in enumerate(safe_cmd):
-                # Redact basic auth credentials
-                if arg == "-u" and i+1 < len(safe_cmd):
-                    safe_cmd[i+1] = "REDACTED_CREDENTIALS"
-                
-                # Redact any JSON data that might contain credentials
-                if arg == "-d" and i+1 < len(safe_cmd):
-                    try:
-                        # Check if it's JSON
-                        json_data = json.loads(safe_cmd[i+1])
-                        # Redact any fields that might contain sensitive info
-                        for key in json_data.keys():
-                            if any(sensitive in key.lower() for sensitive in ['pass', 'secret', 'key', 'token', 'auth']):
-                                json_data[key] = "REDACTED"
-                        safe_cmd[i+1] = json.dumps(json_data)
-                    except (json.JSONDecodeError, TypeError):
-                        # Not JSON or couldn't parse, leave as is
-                        pass
-        except Exception as e:
-            # If anything goes wrong with redaction, use a completely safe fallback
-            logger.debug(f"Error in command redaction: {e}")
-            # Just show the command without any arguments
-            return [cmd[0], "[arguments redacted for security]"]
-        
+        # The credentials sit at a known position in the base arguments
+        safe_cmd[self._auth_index] = "REDACTED_CREDENTIALS"
         return safe_cmd
     
-    def _redact_sensitive_data(self, text: str) -> str:
-        """Redact potentially sensitive information from text."""
-        if not text:
-            return text
-            
-        # List of patterns to redact
-        patterns = [
-            # API keys and tokens (hex format)
-            r'([a-zA-Z0-9]{8,}[-_]?[a-zA-Z0-9]{4,}[-_]?[a-zA-Z0-9]{4,}[-_]?[a-zA-Z0-9]{4,}[-_]?[a-zA-Z0-9]{12,})',
-            # Basic auth credentials
-            r'([a-zA-Z0-9+/=]{20,}:)?[a-zA-Z0-9+/=]{20,}',
-            # URL with credentials
-            r'(https?://)([^:]+):([^@]+)@',
-            # OPNsense specific API key format
-            r'([A-Za-z0-9]{16,})'
-        ]
-        
-        # Apply redaction
-        redacted_text = text
-        for pattern in patterns:
-            redacted_text = re.sub(pattern, 'REDACTED', redacted_text)
-        
-        return redacted_text
-
+    def _redact_body(self, body: bytes) -> str:
+        """Create a safe version of a JSON request body for logging."""
+        try:
+            json_data = json.loads(body)
+            # Redact any fields that might contain sensitive info
+            for key in json_data.keys():
+                lowered = key.lower()
+                if any(sensitive in lowered for sensitive in SENSITIVE_KEY_PARTS):
+                    json_data[key] = "REDACTED"
+            return json.dumps(json_data)
+        except Exception as e:
+            # If anything goes wrong with redaction, don't show the body at all
+            logger.debug("Error in body redaction: %s", e)
+            return "[body redacted for security]"
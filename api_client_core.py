@@ -4,51 +4,196 @@ Core OPNsense API client implementation with improved connection handling.
 """
 import os
 import time
+import base64
+import functools
 import logging
+import re
 import socket
+import threading
+import ipaddress
+from dataclasses import dataclass, field
 from typing import Dict, Any, Optional, Union, List, Tuple
 
+# Prefer orjson for API responses: it parses bytes directly and is several
+# times faster than the stdlib parser on large Unbound host lists.
+# dumps_json always returns compact UTF-8 bytes, ready to send as a request body.
+try:
+    import orjson
+    loads_json = orjson.loads
+    dumps_json = orjson.dumps
+except ImportError:
+    import json
+    loads_json = json.loads
+    
+    def dumps_json(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
 # Get module logger
 logger = logging.getLogger('dns_updater.api')
 
-class ConnectionConfig:
-    """Configuration for connection parameters."""
+# Generic patterns for credentials of unknown shape. The client's own key
+# and secret are removed with a literal replace before these run.
+_REDACT_PATTERNS = (
+    # URL with credentials
+    r'https?://[^:/@\s]+:[^@\s]+@',
+    # API keys, tokens and base64 blobs: one anchored run, so matching stays
+    # linear in the input. '/' is left out so URL paths in log lines survive;
+    # the client's own base64 token is caught by the literal replace.
+    r'\b[A-Za-z0-9][A-Za-z0-9+=_-]{31,}'
+)
+# All patterns compiled into one alternation so redaction is a single pass
+_REDACT_RE = re.compile("|".join(f"(?:{p})" for p in _REDACT_PATTERNS))
+# Length of the shortest possible match ("http://a:b@"); shorter text is
+# returned without running the regex
+_REDACT_MIN_LENGTH = 11
+
+def redact_text(text: str, secrets=()) -> str:
+    """Redact the given known secrets, then credential-shaped strings, from text."""
+    if not text:
+        return text
+    
+    # Known credentials are caught cheaply with a literal replace
+    for secret in secrets:
+        if secret:
+            text = text.replace(secret, 'REDACTED')
+    
+    # Then look for other credential-shaped strings
+    if len(text) < _REDACT_MIN_LENGTH:
+        return text
+    return _REDACT_RE.sub('REDACTED', text)
+
+class RedactFilter(logging.Filter):
+    """
+    Redact credentials from API log records as they are emitted.
+    
+    Filters run only for records that pass the level check, so messages
+    that are never logged are never scanned.
+    """
+    # Shorter values are not redacted literally: they would mangle unrelated
+    # log text, and are too short to be real API credentials anyway
+    MIN_SECRET_LENGTH = 8
+    
     def __init__(self):
-        """Load connection configuration from environment variables."""
-        # Connection timeouts
-        self.connect_timeout = int(os.environ.get('CONNECT_TIMEOUT', '5'))
-        self.read_timeout = int(os.environ.get('READ_TIMEOUT', '30'))
-        
-        # Socket-level settings
-        self.socket_timeout = float(os.environ.get('SOCKET_TIMEOUT', '5.0'))
-        
-        # Retry configuration
-        self.retry_count = int(os.environ.get('API_RETRY_COUNT', '3'))
-        self.backoff_factor = float(os.environ.get('API_BACKOFF_FACTOR', '0.3'))
-        self.retry_max_time = int(os.environ.get('RETRY_MAX_TIME', '60'))
-        
-        # SSL verification
-        self.verify_ssl = os.environ.get('VERIFY_SSL', 'true').lower() != 'false'
-        
-        # API rate limiting
-        self.min_call_interval = float(os.environ.get('MIN_CALL_INTERVAL', '1.0'))
-        
-        # Protocol options
-        self.use_ip_direct = os.environ.get('USE_IP_DIRECT', 'false').lower() == 'true'
-        self.opnsense_ip = os.environ.get('OPNSENSE_IP', '')
-        self.force_http1 = os.environ.get('FORCE_HTTP1', 'false').lower() == 'true'
-        
-        # Alternative methods
-        self.use_curl_fallback = os.environ.get('USE_CURL_FALLBACK', 'false').lower() == 'true'
-        
-        # Connection handling
-        self.max_connection_errors = int(os.environ.get('MAX_CONNECTION_ERRORS', '5'))
-        self.reconnect_delay = float(os.environ.get('RECONNECT_DELAY', '5.0'))
-        
-        # DNS
-        self.dns_cache_ttl = int(os.environ.get('DNS_CACHE_TTL', '60'))
+        super().__init__()
+        # Credentials of every client created in this process. Replaced as a
+        # whole, never mutated, so records logged from other threads can
+        # iterate it without locking
+        self.secrets: frozenset = frozenset()
+        self._secrets_lock = threading.Lock()
+    
+    def add_secrets(self, secrets) -> None:
+        """Add credentials to redact from every record."""
+        new = {s for s in secrets if s and len(s) >= self.MIN_SECRET_LENGTH}
+        with self._secrets_lock:
+            self.secrets = self.secrets | new
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        try:
+            message = record.getMessage()
+        except Exception:
+            # Malformed msg/args: leave the record for the handler, which
+            # reports it through logging's own error handling
+            return True
+        record.msg = redact_text(message, self.secrets)
+        record.args = None
         
-        self._log_config()
+        # Tracebacks can carry the key or token too; formatters use a
+        # preset exc_text instead of formatting exc_info again
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = redact_text(record.exc_text, self.secrets)
+        return True
+
+_exception_formatter = logging.Formatter()
+_redact_filter = RedactFilter()
+logger.addFilter(_redact_filter)
+
+# Process-wide DNS cache for the OPNsense host: hostname -> (ip, expiry).
+# A failed lookup is cached as None for a short time, so a down resolver
+# doesn't add a blocking getaddrinfo to every request.
+_DNS_CACHE: Dict[str, Tuple[Optional[str], float]] = {}
+_DNS_CACHE_LOCK = threading.Lock()
+_DNS_FAILURE_TTL = 10
+
+def resolve_cached(host: str, port: int, ttl: float) -> Optional[str]:
+    """Resolve a hostname to an IP address, caching the answer for ttl seconds."""
+    now = time.monotonic()
+    with _DNS_CACHE_LOCK:
+        entry = _DNS_CACHE.get(host)
+    if entry is not None and entry[1] > now:
+        return entry[0]
+    
+    try:
+        ip = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        expires = now + ttl
+    except (socket.gaierror, IndexError) as e:
+        # Logged once per failure period, not on every cached miss
+        logger.debug("DNS lookup for %s failed, not retrying for %ss: %s", host, _DNS_FAILURE_TTL, e)
+        ip = None
+        expires = now + min(ttl, _DNS_FAILURE_TTL)
+    
+    with _DNS_CACHE_LOCK:
+        _DNS_CACHE[host] = (ip, expires)
+    return ip
+
+# Registry of API client implementations by name. Each backend module adds
+# its class with @register_backend when it is imported.
+BACKENDS: Dict[str, type] = {}
+
+def register_backend(name: str):
+    """Class decorator registering an API client implementation."""
+    def decorator(cls):
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+def _env_field(name: str, default: str, convert=str):
+    """Dataclass field whose default is read from an environment variable."""
+    return field(default_factory=lambda: convert(os.environ.get(name, default)))
+
+def _is_true(value: str) -> bool:
+    return value.lower() == 'true'
+
+@dataclass(frozen=True, slots=True)
+class ConnectionConfig:
+    """Configuration for connection parameters, loaded from the environment."""
+    # Connection timeouts
+    connect_timeout: int = _env_field('CONNECT_TIMEOUT', '5', int)
+    read_timeout: int = _env_field('READ_TIMEOUT', '30', int)
+    
+    # Socket-level settings
+    socket_timeout: float = _env_field('SOCKET_TIMEOUT', '5.0', float)
+    
+    # Retry configuration
+    retry_count: int = _env_field('API_RETRY_COUNT', '3', int)
+    backoff_factor: float = _env_field('API_BACKOFF_FACTOR', '0.3', float)
+    retry_max_time: int = _env_field('RETRY_MAX_TIME', '60', int)
+    
+    # Pooled connections to the (single) OPNsense host
+    pool_size: int = _env_field('API_POOL_MAXSIZE', '10', int)
+    
+    # SSL verification
+    verify_ssl: bool = _env_field('VERIFY_SSL', 'true', lambda v: v.lower() != 'false')
+    
+    # API rate limiting
+    min_call_interval: float = _env_field('MIN_CALL_INTERVAL', '1.0', float)
+    rate_burst: int = _env_field('API_RATE_BURST', '5', int)
+    
+    # Protocol options
+    use_ip_direct: bool = _env_field('USE_IP_DIRECT', 'false', _is_true)
+    opnsense_ip: str = _env_field('OPNSENSE_IP', '')
+    force_http1: bool = _env_field('FORCE_HTTP1', 'false', _is_true)
+    
+    # Alternative methods
+    use_curl_fallback: bool = _env_field('USE_CURL_FALLBACK', 'false', _is_true)
+    
+    # Connection handling
+    max_connection_errors: int = _env_field('MAX_CONNECTION_ERRORS', '5', int)
+    reconnect_delay: float = _env_field('RECONNECT_DELAY', '5.0', float)
+    
+    # DNS
+    dns_cache_ttl: int = _env_field('DNS_CACHE_TTL', '60', int)
         
     def _log_config(self):
         """Log the configuration settings."""
@@ -58,6 +203,7 @@ class ConnectionConfig:
         logger.info(f"- Socket timeout: {self.socket_timeout}s")
         logger.info(f"- Retry count: {self.retry_count}")
         logger.info(f"- Backoff factor: {self.backoff_factor}")
+        logger.info(f"- Pool size: {self.pool_size}")
         logger.info(f"- Verify SSL: {self.verify_ssl}")
         logger.info(f"- Force HTTP/1: {self.force_http1}")
         
@@ -66,7 +212,15 @@ class ConnectionConfig:
         if self.use_curl_fallback:
             logger.info(f"- Using curl fallback if needed")
 
+@functools.lru_cache(maxsize=1)
+def get_connection_config() -> ConnectionConfig:
+    """Load and log the connection configuration once per process."""
+    config = ConnectionConfig()
+    config._log_config()
+    return config
 
+
+@register_backend('core')
 class OPNsenseAPICore:
     """
     Core functionality for the OPNsense API client.
@@ -75,17 +229,30 @@ class OPNsenseAPICore:
         """Initialize the OPNsense API client with credentials."""
         self.base_url = base_url
         self.auth = (key, secret)
-        self.config = ConnectionConfig()
         
-        # Store original socket timeout
-        self.original_socket_timeout = socket.getdefaulttimeout()
+        # Basic auth header value, encoded once instead of on every request
+        token = base64.b64encode(f"{key}:{secret}".encode()).decode()
+        self.auth_header = f"Basic {token}"
+        
+        # Known credentials for redaction; the log filter learns them too
+        self._secrets = (key, secret, token)
+        _redact_filter.add_secrets(self._secrets)
+        self.config = get_connection_config()
         
         # API state tracking
         self.is_connected = False
         self.connection_errors = 0
-        self.last_api_call = 0
+        self._rate_lock = threading.Lock()
+        
+        # Rate limiter state: the next call's theoretical start time, and how
+        # far ahead of it a call may run while a burst is still allowed
+        self._next_allowed = 0.0
+        self._burst_tolerance = (max(1, self.config.rate_burst) - 1) * self.config.min_call_interval
         self.using_alternate_method = False
         
+        # Pooled session for the minimal get/post below, created on first use
+        self.session = None
+        
         # Enable detailed logging for debugging
         if os.environ.get('LOG_LEVEL', '').upper() == 'DEBUG':
             self._enable_http_debugging()
@@ -94,6 +261,13 @@ class OPNsenseAPICore:
         if self.config.use_ip_direct and self.config.opnsense_ip:
             self._use_direct_ip()
             
+        # Host and port to look up through the DNS cache; None when the URL
+        # already contains an IP address
+        self._api_host, self._api_port = self._cacheable_host()
+        
+        # Request URLs are built by concatenation onto this prefix
+        self._url_prefix = self.base_url.rstrip('/') + '/'
+            
         logger.info(f"Initialized OPNsense API client core for {base_url}")
         
     def _enable_http_debugging(self):
@@ -132,17 +306,82 @@ class OPNsenseAPICore:
         except Exception as e:
             logger.warning(f"Failed to use direct IP: {e}")
             
-    def _rate_limit(self) -> None:
-        """Enforce rate limiting between API calls."""
-        now = time.time()
-        elapsed = now - self.last_api_call
+    def _cacheable_host(self) -> Tuple[Optional[str], Optional[int]]:
+        """Return the (hostname, port) of the API URL if it needs a DNS lookup."""
+        from urllib.parse import urlparse
+        parsed = urlparse(self.base_url)
+        host = parsed.hostname
+        if not host:
+            return None, None
+        try:
+            ipaddress.ip_address(host)
+            return None, None
+        except ValueError:
+            pass
+        return host, parsed.port or (443 if parsed.scheme == 'https' else 80)
+            
+    def _reserve_call(self) -> float:
+        """
+        Reserve a slot for one API call and return how long to wait before making it.
+        
+        Up to API_RATE_BURST calls go out back to back, after which calls are
+        paced to one per MIN_CALL_INTERVAL on average. This is the token bucket
+        expressed as a single deadline (GCRA), so no refill arithmetic is needed.
+        """
+        interval = self.config.min_call_interval
+        if interval <= 0:
+            return 0.0
         
-        if elapsed < self.config.min_call_interval:
-            sleep_time = self.config.min_call_interval - elapsed
-            logger.debug(f"Rate limiting: sleeping {sleep_time:.2f}s")
+        with self._rate_lock:
+            # Monotonic clock so NTP adjustments can't stall or skip the limiter
+            now = time.monotonic()
+            scheduled = max(self._next_allowed, now)
+            self._next_allowed = scheduled + interval
+            return max(0.0, scheduled - self._burst_tolerance - now)
+            
+    def _rate_limit(self) -> None:
+        """Enforce rate limiting between API calls (shared across threads)."""
+        sleep_time = self._reserve_call()
+        if sleep_time > 0:
+            logger.debug("Rate limiting: sleeping %.2fs", sleep_time)
             time.sleep(sleep_time)
+        
+    def _join_url(self, endpoint: str) -> str:
+        """Build the request URL for an endpoint; a leading slash is optional."""
+        return self._url_prefix + endpoint.lstrip('/')
+    
+    def _redact_sensitive_data(self, text: str) -> str:
+        """Redact potentially sensitive information from text."""
+        return redact_text(text, self._secrets)
+    
+    def _get_session(self):
+        """Return a keep-alive requests session, creating it on first use."""
+        if self.session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            
+            retry_strategy = Retry(
+                total=self.config.retry_count,
+                backoff_factor=self.config.backoff_factor,
+                status_forcelist=[502, 503, 504]
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.config.pool_size, max_retries=retry_strategy)
             
-        self.last_api_call = time.time()
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                'Authorization': self.auth_header,
+                'Connection': 'keep-alive'
+            })
+            session.verify = self.config.verify_ssl
+            self.session = session
+        return self.session
+    
+    def close(self) -> None:
+        """Release any connection resources held by this client."""
+        pass
         
     def _handle_error(self, error: Exception, method: str, url: str) -> Dict:
         """Handle API request errors with appropriate logging."""
@@ -164,20 +403,17 @@ class OPNsenseAPICore:
     def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
         """Make a GET request to the OPNsense API."""
         self._rate_limit()
-        url = f"{self.base_url}/{endpoint}"
+        url = self._join_url(endpoint)
         logger.warning(f"Using minimally implemented GET method in core API client. Limited functionality.")
         
         try:
-            import requests
-            response = requests.get(
+            response = self._get_session().get(
                 url, 
-                auth=self.auth, 
                 params=params,
-                verify=self.config.verify_ssl,
                 timeout=(self.config.connect_timeout, self.config.read_timeout)
             )
             response.raise_for_status()
-            return response.json()
+            return loads_json(response.content)
         except Exception as e:
             logger.error(f"GET request failed: {e}")
             return {"status": "error", "message": str(e)}
@@ -185,25 +421,21 @@ class OPNsenseAPICore:
     def post(self, endpoint: str, data: Any = None) -> Dict:
         """Make a POST request to the OPNsense API."""
         self._rate_limit()
-        url = f"{self.base_url}/{endpoint}"
+        url = self._join_url(endpoint)
         logger.warning(f"Using minimally implemented POST method in core API client. Limited functionality.")
         
         try:
-            import requests
-            
             # Fix: Always use JSON format - empty JSON object for empty data
             if data is None:
                 data = {}
                 
-            response = requests.post(
+            response = self._get_session().post(
                 url, 
-                auth=self.auth, 
                 json=data,
-                verify=self.config.verify_ssl,
                 timeout=(self.config.connect_timeout, self.config.read_timeout)
             )
             response.raise_for_status()
-            return response.json()
+            return loads_json(response.content)
         except Exception as e:
             logger.error(f"POST request failed: {e}")
             return {"status": "error", "message": str(e)}
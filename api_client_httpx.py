@@ -0,0 +1,112 @@
+# api_client_httpx.py
+"""
+HTTP/2 implementation of the OPNsense API client using httpx.
+"""
+import time
+import logging
+import httpx
+from typing import Dict, Any, Optional, Tuple
+
+from api_client_core import OPNsenseAPICore, loads_json, register_backend
+
+# Get module logger
+logger = logging.getLogger('dns_updater.api')
+
+# Process-wide clients keyed by (base_url, key) so that all API calls to the
+# same OPNsense host are multiplexed over one HTTP/2 connection
+_CLIENT_CACHE: Dict[Tuple[str, str], httpx.Client] = {}
+
+@register_backend('httpx')
+class OPNsenseAPIHttpx(OPNsenseAPICore):
+    """
+    OPNsense API client implementation using httpx.
+
+    Uses HTTP/2 unless FORCE_HTTP1 is set, so concurrent requests share a
+    single TLS connection to the OPNsense web server.
+    """
+    def __init__(self, base_url: str, key: str, secret: str):
+        """Initialize the OPNsense API client with credentials."""
+        super().__init__(base_url, key, secret)
+
+        self.client = self._create_client()
+        logger.info(f"httpx-based API client initialized (HTTP/2: {not self.config.force_http1})")
+
+    def _create_client(self) -> httpx.Client:
+        """Get or create the shared httpx client for this host and key."""
+        cache_key = (self.base_url, self.auth[0])
+        client = _CLIENT_CACHE.get(cache_key)
+        if client is not None:
+            logger.debug("Reusing shared httpx client for OPNsense API")
+            return client
+
+        # Raises ImportError if HTTP/2 support (h2) is not installed
+        client = httpx.Client(**self._client_options())
+        if not self.config.verify_ssl:
+            logger.warning("SSL verification disabled - SECURITY RISK")
+
+        _CLIENT_CACHE[cache_key] = client
+        return client
+
+    def _client_options(self) -> Dict[str, Any]:
+        """Keyword arguments for the shared httpx client."""
+        return {
+            'http2': not self.config.force_http1,
+            'headers': {'Authorization': self.auth_header},
+            'verify': self.config.verify_ssl,
+            'timeout': httpx.Timeout(self.config.read_timeout, connect=self.config.connect_timeout),
+            'limits': httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+        }
+
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
+        """Make a GET request to the OPNsense API."""
+        self._rate_limit()
+        url = self._join_url(endpoint)
+
+        try:
+            logger.debug("GET %s", url)
+            start_time = time.time()
+
+            response = self.client.get(url, params=params)
+
+            logger.debug("GET request completed in %.2fs (%s)", time.time() - start_time, response.http_version)
+            return self._handle_response(response)
+
+        except httpx.HTTPError as e:
+            # Redact any sensitive information in the error message
+            safe_error = self._redact_sensitive_data(str(e))
+            return self._handle_error(Exception(safe_error), "GET", url)
+
+    def post(self, endpoint: str, data: Any = None) -> Dict:
+        """Make a POST request to the OPNsense API."""
+        self._rate_limit()
+        url = self._join_url(endpoint)
+
+        try:
+            logger.debug("POST %s", url)
+            start_time = time.time()
+
+            # Always use JSON format - empty JSON object for empty data
+            response = self.client.post(url, json={} if data is None else data)
+
+            logger.debug("POST request completed in %.2fs (%s)", time.time() - start_time, response.http_version)
+            return self._handle_response(response)
+
+        except httpx.HTTPError as e:
+            # Redact any sensitive information in the error message
+            safe_error = self._redact_sensitive_data(str(e))
+            return self._handle_error(Exception(safe_error), "POST", url)
+
+    def _handle_response(self, response: httpx.Response) -> Dict:
+        """Process and validate API response."""
+        if not response.is_success:
+            logger.error("HTTP error: %s %s for url: %s", response.status_code, response.reason_phrase, response.url)
+            return {"status": "error", "message": f"{response.status_code} {response.reason_phrase}"}
+
+        self.is_connected = True
+        self.connection_errors = 0
+
+        try:
+            return loads_json(response.content)
+        except ValueError:
+            logger.warning("Invalid JSON response from %s", response.url)
+            return {"status": "error", "message": "Invalid JSON response"}
@@ -2,66 +2,110 @@
 """
 Requests-based implementation of the OPNsense API client.
 """
-import os
 import time
+import functools
 import logging
-import socket
 import requests
 import urllib3
-import re  # Added missing import
+from urllib.parse import urlencode
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Optional, Tuple, Union
 
-from api_client_core import OPNsenseAPICore
+from api_client_core import OPNsenseAPICore, loads_json, register_backend
 
 # Get module logger
 logger = logging.getLogger('dns_updater.api')
 
+# Process-wide sessions keyed by (base_url, key) so that every client talking
+# to the same OPNsense host shares one connection pool and TLS session
+_SESSION_CACHE: Dict[Tuple[str, str], requests.Session] = {}
+
+_insecure_warnings_disabled = False
+
+def _disable_insecure_warnings() -> None:
+    """Silence urllib3's InsecureRequestWarning once per process."""
+    global _insecure_warnings_disabled
+    if not _insecure_warnings_disabled:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        _insecure_warnings_disabled = True
+
+@functools.lru_cache(maxsize=None)
+def _build_adapter(retry_count: int, backoff_factor: float, pool_size: int) -> HTTPAdapter:
+    """Build one HTTPAdapter per distinct configuration and share it."""
+    retry_strategy = Retry(
+        total=retry_count,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET", "POST"],
+        raise_on_redirect=False,
+        raise_on_status=False
+    )
+    
+    # Pool sized for a single OPNsense host
+    return HTTPAdapter(
+        max_retries=retry_strategy,
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        pool_block=False
+    )
+
+@register_backend('requests')
 class OPNsenseAPI(OPNsenseAPICore):
     """
     Complete OPNsense API client implementation using requests library.
     """
+    # Time of the last successful response per base URL, shared by all
+    # clients so a recently verified host is not probed again
+    _last_good_connection: Dict[str, float] = {}
+    CONNECTION_TEST_INTERVAL = 30
+    
     def __init__(self, base_url: str, key: str, secret: str):
         """Initialize the OPNsense API client with credentials."""
         super().__init__(base_url, key, secret)
         
         # Create the session with appropriate settings
         self.session = self._create_session()
+        
+        # requests ignores a session-level timeout, so it is passed on every
+        # call; the tuple keeps connect and read timeouts distinct
+        self.timeout = (self.config.connect_timeout, self.config.read_timeout)
+        
+        # Pre-bind the hot-path lookups used by every get/post
+        self._session_get = self.session.get
+        self._session_post = self.session.post
+        
+        # Parsed GET responses with their ETag live in the shared DNS cache,
+        # so they survive client re-creation: "etag:<url>" -> (result, etag)
+        from cache_manager import get_cache
+        self._response_cache = get_cache()
         logger.info(f"Requests-based API client initialized")
         
         # Test connection initially to detect any issues
         self._test_connection()
         
     def _create_session(self) -> requests.Session:
-        """Create and configure a requests session with retry logic."""
-        # Set lower-level socket timeout to prevent connection hanging
-        socket.setdefaulttimeout(self.config.socket_timeout)
-        
-        # Configure retry strategy
-        retry_strategy = Retry(
-            total=self.config.retry_count,
-            backoff_factor=self.config.backoff_factor,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "POST"],
-            raise_on_redirect=False,
-            raise_on_status=False
-        )
-        
-        # Create session
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        """Get or create the shared requests session for this host and key."""
+        cache_key = (self.base_url, self.auth[0])
+        session = _SESSION_CACHE.get(cache_key)
+        if session is not None:
+            logger.debug("Reusing shared session for OPNsense API")
+            return session
+        
+        # Shared adapter (and connection pool) for this retry/pool configuration
+        adapter = _build_adapter(self.config.retry_count, self.config.backoff_factor, self.config.pool_size)
         session = requests.Session()
         session.mount("https://", adapter)
         session.mount("http://", adapter)
-        session.auth = self.auth
-        
-        # Use tuple for connect and read timeouts (important distinction!)
-        session.timeout = (self.config.connect_timeout, self.config.read_timeout)
+        session.headers.update({
+            'Authorization': self.auth_header,
+            'Connection': 'keep-alive'
+        })
         
         # Set SSL verification according to configuration
         session.verify = self.config.verify_ssl
         if not self.config.verify_ssl:
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            _disable_insecure_warnings()
             logger.warning("SSL verification disabled - SECURITY RISK")
         
         # Force HTTP/1.1 if configured (can help with compatibility issues)
@@ -74,27 +118,28 @@ class OPNsenseAPI(OPNsenseAPICore):
                 session.config = {'http_version': '1.1'}
                 logger.info("Forcing HTTP/1.1 via session config")
         
+        _SESSION_CACHE[cache_key] = session
         return session
     
     def _test_connection(self) -> bool:
         """Test API connection and adjust settings if needed."""
+        start_time = time.time()
+        if start_time - self._last_good_connection.get(self.base_url, 0) < self.CONNECTION_TEST_INTERVAL:
+            logger.debug("Skipping API connection test, host responded recently")
+            self.is_connected = True
+            return True
+        
         logger.info("Testing API connection...")
         try:
-            # Set shorter timeout for the test
-            original_timeout = self.session.timeout
-            self.session.timeout = (5, 10)
-            
-            start_time = time.time()
-            url = f"{self.base_url}/core/firmware/status"
+            url = self._url_prefix + "core/firmware/status"
             
-            logger.debug(f"Testing connection to {url}")
-            response = self.session.get(url)
+            logger.debug("Testing connection to %s", url)
+            # Use a shorter timeout for the test
+            self.session.get(url, timeout=(5, 10))
             
             elapsed = time.time() - start_time
             logger.info(f"API connection test successful ({elapsed:.2f}s)")
-            
-            # Restore original timeout
-            self.session.timeout = original_timeout
+            self._last_good_connection[self.base_url] = time.time()
             self.is_connected = True
             return True
             
@@ -106,65 +151,72 @@ class OPNsenseAPI(OPNsenseAPICore):
             if isinstance(e, requests.exceptions.ConnectTimeout):
                 new_timeout = self.config.connect_timeout * 2
                 logger.info(f"Increasing connect timeout to {new_timeout}s")
-                self.session.timeout = (new_timeout, self.config.read_timeout)
+                self.timeout = (new_timeout, self.config.read_timeout)
                 
-            # Restore original timeout
-            self.session.timeout = original_timeout
             return False
             
-        finally:
-            # Restore original socket timeout
-            socket.setdefaulttimeout(self.original_socket_timeout)
-            
     def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
         """Make a GET request to the OPNsense API."""
         self._rate_limit()
-        url = f"{self.base_url}/{endpoint}"
-        
-        # Temporarily set socket timeout
-        socket.setdefaulttimeout(self.config.socket_timeout)
+        url = self._join_url(endpoint)
         
         try:
-            logger.debug(f"GET {url}")
+            logger.debug("GET %s", url)
             start_time = time.time()
             
-            response = self.session.get(url, params=params)
+            # Revalidate a cached response instead of downloading it again
+            cache_key = f"etag:{url}?{urlencode(params, doseq=True)}" if params else f"etag:{url}"
+            cached = self._response_cache.get(cache_key)
+            headers = {'If-None-Match': cached[1]} if cached else None
+            
+            response = self._session_get(url, params=params, headers=headers, timeout=self.timeout)
             
             elapsed = time.time() - start_time
-            logger.debug(f"GET request completed in {elapsed:.2f}s")
+            logger.debug("GET request completed in %.2fs", elapsed)
             
-            return self._handle_response(response)
+            if cached and response.status_code == 304:
+                logger.debug("GET %s not modified, using cached response", url)
+                self.is_connected = True
+                self.connection_errors = 0
+                # Still current, so keep it for another TTL
+                self._response_cache.set(cache_key, cached)
+                return cached[0]
+            
+            result = self._handle_response(response)
+            self._cache_response(cache_key, response, result)
+            return result
             
         except requests.exceptions.RequestException as e:
             # Redact any sensitive information in the error message
             error_msg = str(e)
             safe_error = self._redact_sensitive_data(error_msg)
             return self._handle_error(Exception(safe_error), "GET", url)
-            
-        finally:
-            # Restore original socket timeout
-            socket.setdefaulttimeout(self.original_socket_timeout)
+    
+    def _cache_response(self, cache_key: str, response: requests.Response, result: Dict) -> None:
+        """Remember a parsed GET response if the server sent an ETag for it."""
+        etag = response.headers.get('ETag')
+        if not etag or not response.ok or (isinstance(result, dict) and result.get('status') == 'error'):
+            return
+        
+        self._response_cache.set(cache_key, (result, etag))
     
     def post(self, endpoint: str, data: Any = None) -> Dict:
         """Make a POST request to the OPNsense API."""
         self._rate_limit()
-        url = f"{self.base_url}/{endpoint}"
-    
-        # Temporarily set socket timeout
-        socket.setdefaulttimeout(self.config.socket_timeout)
+        url = self._join_url(endpoint)
     
         try:
-            logger.debug(f"POST {url}")
+            logger.debug("POST %s", url)
             start_time = time.time()
         
             # Fix: Always use JSON format - empty JSON object for empty data
             if data is None:
-                response = self.session.post(url, json={})  # Changed from data="" to json={}
+                response = self._session_post(url, json={}, timeout=self.timeout)  # Changed from data="" to json={}
             else:
-                response = self.session.post(url, json=data)
+                response = self._session_post(url, json=data, timeout=self.timeout)
         
             elapsed = time.time() - start_time
-            logger.debug(f"POST request completed in {elapsed:.2f}s")
+            logger.debug("POST request completed in %.2fs", elapsed)
         
             return self._handle_response(response)
         
@@ -173,63 +225,34 @@ class OPNsenseAPI(OPNsenseAPICore):
             error_msg = str(e)
             safe_error = self._redact_sensitive_data(error_msg)
             return self._handle_error(Exception(safe_error), "POST", url)
-        
-        finally:
-            # Restore original socket timeout
-            socket.setdefaulttimeout(self.original_socket_timeout)
     
     def _handle_response(self, response: requests.Response) -> Dict:
         """Process and validate API response."""
-        try:
-            response.raise_for_status()
-            self.is_connected = True
-            self.connection_errors = 0
-            
-            # Reset alternate method flag if we're using it and this succeeded
-            if self.using_alternate_method:
-                logger.info("Switching back to primary connection method for future requests")
-                self.using_alternate_method = False
-            
-            # Only try to parse JSON for successful responses
-            try:
-                return response.json()
-            except ValueError:
-                # Redact any sensitive data that might be in the response
-                safe_response = self._redact_sensitive_data(response.text[:100])
-                logger.warning(f"Invalid JSON response: {safe_response}")
-                return {"status": "error", "message": "Invalid JSON response"}
-            
-        except requests.exceptions.HTTPError as e:
+        if not response.ok:
             # Redact any sensitive information in the error response
-            error_msg = str(e)
-            safe_error = self._redact_sensitive_data(error_msg)
-            logger.error(f"HTTP error: {safe_error}")
+            safe_error = self._redact_sensitive_data(f"{response.status_code} {response.reason} for url: {response.url}")
+            logger.error("HTTP error: %s", safe_error)
             
-            # Also redact response content for logging
-            safe_content = self._redact_sensitive_data(response.text[:200])
-            logger.debug(f"Response content: {safe_content}")
+            # Only decode a bounded prefix, and only if it will be logged; the
+            # log filter redacts it
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Response content: %s", response.content[:200].decode('utf-8', errors='replace'))
             return {"status": "error", "message": safe_error}
-
-    def _redact_sensitive_data(self, text: str) -> str:
-        """Redact potentially sensitive information from text."""
-        if not text:
-            return text
-            
-        # List of patterns to redact
-        patterns = [
-            # API keys and tokens (hex format)
-            r'([a-zA-Z0-9]{8,}[-_]?[a-zA-Z0-9]{4,}[-_]?[a-zA-Z0-9]{4,}[-_]?[a-zA-Z0-9]{4,}[-_]?[a-zA-Z0-9]{12,})',
-            # Basic auth credentials
-            r'([a-zA-Z0-9+/=]{20,}:)?[a-zA-Z0-9+/=]{20,}',
-            # URL with credentials
-            r'(https?://)([^:]+):([^@]+)@',
-            # OPNsense specific API key format
-            r'([A-Za-z0-9]{16,})'
-        ]
-        
-        # Apply redaction
-        redacted_text = text
-        for pattern in patterns:
-            redacted_text = re.sub(pattern, 'REDACTED', redacted_text)
-        
-        return redacted_text
+        
+        self.is_connected = True
+        self.connection_errors = 0
+        self._last_good_connection[self.base_url] = time.time()
+        
+        # Reset alternate method flag if we're using it and this succeeded
+        if self.using_alternate_method:
+            logger.info("Switching back to primary connection method for future requests")
+            self.using_alternate_method = False
+        
+        # Only try to parse JSON for successful responses; parse the raw
+        # bytes rather than letting requests decode them to text first
+        try:
+            return loads_json(response.content)
+        except ValueError:
+            # Sensitive data in the response is redacted by the log filter
+            logger.warning("Invalid JSON response: %s", response.content[:100].decode('utf-8', errors='replace'))
+            return {"status": "error", "message": "Invalid JSON response"}
@@ -1,71 +1,183 @@
 # cache_manager.py
+import os
+import json
 import time
+import atexit
 import logging
+import tempfile
+import threading
 from typing import Dict, Any, Optional, List, Tuple
 
 # Get module logger
 logger = logging.getLogger('dns_updater.cache')
 
 class DNSCache:
-    def __init__(self, ttl_seconds: int = 60):
-        """Initialize the DNS cache with specified TTL."""
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    # Minimum seconds between writes of the persisted cache file; changes
+    # are saved in the background at most this often
+    SAVE_INTERVAL = 30
+    
+    # Keys that are never persisted: cached API responses are large and are
+    # revalidated by ETag anyway
+    TRANSIENT_PREFIXES = ('etag:',)
+    
+    def __init__(self, ttl_seconds: int = 60, max_entries: int = 10000,
+                 persist_path: Optional[str] = None):
+        """Initialize the DNS cache with specified TTL and size bound."""
+        # key -> (expires, value); a tuple is far smaller than an inner dict.
+        # Insertion order doubles as age order for eviction.
+        self.cache: Dict[str, Tuple[float, Any]] = {}
         self.default_ttl = ttl_seconds
-        logger.info(f"Initialized DNS cache with {ttl_seconds}s TTL")
+        self.max_entries = max_entries
+        
+        # Instance bindings for the hit path; LOG_LEVEL is fixed at startup,
+        # before the cache is created, so the debug check can be made once
+        self._now = time.time
+        self._debug = logger.debug
+        self._debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
+        # Optional JSON file so a restarted container starts with a warm cache
+        self.persist_path = persist_path
+        self._last_save = 0.0
+        # Guards the file write and the pending save timer
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        if persist_path:
+            self._load()
+            atexit.register(self.save)
+            
+        logger.info(f"Initialized DNS cache with {ttl_seconds}s TTL (max {max_entries} entries)")
+    
+    def _load(self) -> None:
+        """Load unexpired entries from the persisted cache file, if any."""
+        try:
+            with open(self.persist_path, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load DNS cache from {self.persist_path}: {e}")
+            return
+        
+        now = self._now()
+        self.cache = {k: (v[0], v[1]) for k, v in entries.items() if v[0] > now}
+        logger.info(f"Loaded {len(self.cache)} DNS cache entries from {self.persist_path}")
+    
+    def save(self) -> None:
+        """Write unexpired entries to the persisted cache file atomically."""
+        if not self.persist_path:
+            return
+            
+        now = self._now()
+        # Serialize entry by entry so one value JSON can't handle (e.g. a
+        # set) is skipped instead of failing every save until it expires
+        parts = []
+        for key, entry in list(self.cache.items()):
+            if entry[0] <= now or key.startswith(self.TRANSIENT_PREFIXES):
+                continue
+            try:
+                parts.append(f"{json.dumps(key)}: {json.dumps(entry)}")
+            except (TypeError, ValueError):
+                logger.debug("Not persisting cache entry %s: value is not JSON serializable", key)
+        
+        with self._save_lock:
+            # A unique temporary file per save, in the target directory so
+            # os.replace stays atomic
+            directory = os.path.dirname(self.persist_path) or '.'
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.dns-cache-', suffix='.tmp')
+            except OSError as e:
+                logger.warning(f"Failed to save DNS cache to {self.persist_path}: {e}")
+                return
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write("{" + ", ".join(parts) + "}")
+                os.replace(tmp_path, self.persist_path)
+                self._last_save = now
+            except OSError as e:
+                logger.warning(f"Failed to save DNS cache to {self.persist_path}: {e}")
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+    
+    def _schedule_save(self) -> None:
+        """Save the cache from a background timer, at most once per SAVE_INTERVAL."""
+        with self._save_lock:
+            if self._save_timer is not None:
+                # The pending save will include this change
+                return
+            delay = max(0.0, self._last_save + self.SAVE_INTERVAL - self._now())
+            self._save_timer = threading.Timer(delay, self._timed_save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def _timed_save(self) -> None:
+        """Run a scheduled save."""
+        with self._save_lock:
+            self._save_timer = None
+        self.save()
     
     def get(self, key: str) -> Optional[Any]:
         """Retrieve item from cache if valid."""
-        if key not in self.cache:
-            return None
+        cache_entry = self.cache.get(key)
+        if cache_entry is not None and cache_entry[0] > self._now():
+            if self._debug_enabled:
+                self._debug("Cache hit: %s", key)
+            return cache_entry[1]
             
-        cache_entry = self.cache[key]
-        if time.time() > cache_entry['expires']:
-            logger.debug(f"Cache entry expired: {key}")
-            return None
-            
-        logger.debug(f"Cache hit: {key}")
-        return cache_entry['value']
+        if cache_entry is not None:
+            # Expire on access so stale entries don't wait for cleanup()
+            self.cache.pop(key, None)
+            if self._debug_enabled:
+                self._debug("Cache entry expired: %s", key)
+        return None
     
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """Store item in cache with expiration time."""
         ttl = ttl or self.default_ttl
-        expires = time.time() + ttl
+        now = self._now()
+        expires = now + ttl
+        
+        # Re-insert so the key moves to the young end of the eviction order
+        self.cache.pop(key, None)
+        if len(self.cache) >= self.max_entries:
+            # Evict the oldest entry to keep memory bounded
+            self.cache.pop(next(iter(self.cache)), None)
+        self.cache[key] = (expires, value)
+        if self._debug_enabled:
+            self._debug("Cache set: %s (expires in %ss)", key, ttl)
         
-        self.cache[key] = {
-            'value': value, 
-            'expires': expires
-        }
-        logger.debug(f"Cache set: {key} (expires in {ttl}s)")
+        if self.persist_path:
+            self._schedule_save()
     
     def invalidate(self, key: str) -> bool:
         """Remove item from cache."""
-        if key in self.cache:
-            del self.cache[key]
-            logger.debug(f"Cache invalidated: {key}")
+        if self.cache.pop(key, None) is not None:
+            logger.debug("Cache invalidated: %s", key)
+            # Don't let a restart resurrect an entry known to be stale
+            if self.persist_path:
+                self._schedule_save()
             return True
         return False
     
     def cleanup(self) -> int:
         """Remove all expired entries and return count of removed items."""
-        now = time.time()
-        expired_keys = [
-            k for k, v in self.cache.items() 
-            if v['expires'] < now
-        ]
-        
-        for key in expired_keys:
-            del self.cache[key]
+        now = self._now()
+        before = len(self.cache)
+        # Rebuild in one pass; the comprehension runs in C
+        self.cache = {k: v for k, v in self.cache.items() if v[0] >= now}
+        removed = before - len(self.cache)
             
-        if expired_keys:
-            logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
+        if removed:
+            logger.debug("Cleaned up %d expired cache entries", removed)
             
-        return len(expired_keys)
+        return removed
     
     def clear(self) -> None:
         """Clear all cache entries."""
         count = len(self.cache)
         self.cache.clear()
-        logger.debug(f"Cache cleared ({count} entries)")
+        logger.debug("Cache cleared (%d entries)", count)
 
 # Singleton cache instance
 _dns_cache = None
@@ -77,6 +189,8 @@ def get_cache(ttl_seconds: Optional[int] = None) -> DNSCache:
     if _dns_cache is None:
         from os import environ
         ttl = ttl_seconds or int(environ.get('DNS_CACHE_TTL', '60'))
-        _dns_cache = DNSCache(ttl)
+        max_entries = int(environ.get('DNS_CACHE_MAX_ENTRIES', '10000'))
+        persist_path = environ.get('DNS_CACHE_FILE', '') or None
+        _dns_cache = DNSCache(ttl, max_entries, persist_path)
         
     return _dns_cache
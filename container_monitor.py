@@ -1,15 +1,63 @@
 # container_monitor.py
 import os
+import re
 import logging
 import time
+import socket
+import functools
+import queue
+import threading
 import docker
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Set, Tuple, Optional, Any
-import ipaddress
+
+# Prefer orjson for decoding the Docker event stream; both parsers accept bytes
+try:
+    from orjson import loads as loads_json
+except ImportError:
+    from json import loads as loads_json
 
 # Get module logger
 logger = logging.getLogger('dns_updater.container')
 
+# FLANNEL_NETWORK line of flannel's subnet.env, matched on the raw bytes
+_FLANNEL_NETWORK_RE = re.compile(rb'^FLANNEL_NETWORK=(\S+)', re.M)
+
+@functools.lru_cache(maxsize=4096)
+def _ip_in_range(range_lo: int, range_hi: int, ip: str) -> bool:
+    """Check if an IPv4 address string falls within an integer range."""
+    try:
+        ip_int = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except OSError:
+        return False
+    return range_lo <= ip_int <= range_hi
+
 class ContainerMonitor:
+    # A burst of container events (e.g. docker-compose up) is coalesced into
+    # one sync: flush after EVENT_DEBOUNCE seconds without a new event, at
+    # most EVENT_MAX_DELAY seconds after the first one, or at MAX_BATCH events
+    EVENT_DEBOUNCE = 0.3
+    EVENT_MAX_DELAY = 0.5
+    MAX_BATCH = 1000
+    
+    # Docker events that can change container addresses. dockerd applies the
+    # filter, so unrelated image, volume and exec events never reach us.
+    CONTAINER_ACTIONS = ('start', 'die', 'destroy', 'create', 'rename')
+    NETWORK_ACTIONS = ('connect', 'disconnect')
+    EVENT_FILTERS = {
+        'type': ['container', 'network'],
+        'event': list(CONTAINER_ACTIONS + NETWORK_ACTIONS)
+    }
+    
+    # Connections kept open to the Docker socket
+    DOCKER_POOL_SIZE = 4
+    
+    FLANNEL_SUBNET_FILE = '/var/run/flannel/subnet.env'
+    
+    # Reconnect backoff: RECONNECT_DELAY doubling up to RECONNECT_MAX_DELAY seconds
+    RECONNECT_DELAY = 5
+    RECONNECT_MAX_DELAY = 60
 
     def __init__(self, dns_manager):
         """Initialize container monitor with DNS manager."""
@@ -22,8 +70,23 @@ class ContainerMonitor:
             cleanup_cycles=int(os.environ.get('STATE_CLEANUP_CYCLES', '3'))
         )
         
-        # Track flannel network information
+        # Running containers by id: (name, {network_name: ip_address}).
+        # Seeded from one full listing, then kept current from the event
+        # stream; None until seeded, after a reconnect and before each
+        # periodic sync, which re-lists everything. An entry's network
+        # dict is treated as frozen: updates replace the whole tuple.
+        self._state: Optional[Dict[str, Tuple[str, Dict[str, str]]]] = None
+        
+        # Ids of containers changed by events and not yet re-inspected
+        self._stale_containers: Set[str] = set()
+        
+        # Track flannel network information; the range is also kept as
+        # integers so membership is two comparisons. The subnet file's mtime
+        # tells when flannel was reconfigured and it must be read again.
         self.flannel_network = None
+        self._flannel_lo = 0
+        self._flannel_hi = -1
+        self._flannel_mtime = None
         
         # Load configuration from environment variables
         self.sync_interval = int(os.environ.get('DNS_SYNC_INTERVAL', '60'))
@@ -36,9 +99,23 @@ class ContainerMonitor:
         logger.info("Container monitor initialized")
         
     def _connect_to_docker(self) -> None:
-        """Connect to Docker daemon."""
+        """Connect to Docker daemon, reusing the current client if it still answers."""
+        # Events may have been missed while disconnected
+        self._state = None
+        
+        if self.docker_client is not None:
+            try:
+                self.docker_client.ping()
+                logger.info("Docker daemon reachable, reusing existing connection pool")
+                return
+            except Exception:
+                self.docker_client.close()
+                self.docker_client = None
+        
         try:
-            self.docker_client = docker.from_env()
+            # The event stream holds one connection; listings and inspects
+            # share the rest of a small pool on the Docker socket
+            self.docker_client = docker.from_env(max_pool_size=self.DOCKER_POOL_SIZE)
             logger.info("Connected to Docker daemon")
         except docker.errors.DockerException as e:
             logger.error(f"Failed to connect to Docker: {e}")
@@ -46,51 +123,51 @@ class ContainerMonitor:
             
     def _detect_flannel_network(self) -> None:
         """Detect flannel network from env file if it exists."""
+        self.flannel_network = None
+        self._flannel_lo = 0
+        self._flannel_hi = -1
+        self._flannel_mtime = self._flannel_file_mtime()
+        
         try:
-            import os
-            if os.path.exists('/var/run/flannel/subnet.env'):
-                with open('/var/run/flannel/subnet.env', 'r') as f:
-                    for line in f:
-                        if line.startswith('FLANNEL_NETWORK='):
-                            network_str = line.strip().split('=')[1]
-                            self.flannel_network = ipaddress.IPv4Network(network_str)
-                            logger.info(f"Detected flannel network: {self.flannel_network}")
-                            return
+            with open(self.FLANNEL_SUBNET_FILE, 'rb') as f:
+                match = _FLANNEL_NETWORK_RE.search(f.read())
+            if match:
+                # Only needed on hosts that run flannel
+                import ipaddress
+                self.flannel_network = ipaddress.IPv4Network(match.group(1).decode())
+                self._flannel_lo = int(self.flannel_network.network_address)
+                self._flannel_hi = int(self.flannel_network.broadcast_address)
+                # Results for a previous range are no longer needed
+                _ip_in_range.cache_clear()
+                logger.info(f"Detected flannel network: {self.flannel_network}")
+                return
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.error(f"Failed to detect flannel network: {e}")
             
         logger.info("No flannel network detected")
     
+    def _flannel_file_mtime(self) -> Optional[int]:
+        """Return the modification time of the flannel subnet file, or None if absent."""
+        try:
+            return os.stat(self.FLANNEL_SUBNET_FILE).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _refresh_flannel_network(self) -> None:
+        """Re-detect the flannel network if its subnet file changed since it was read."""
+        if self._flannel_file_mtime() != self._flannel_mtime:
+            logger.info("Flannel subnet file changed, re-detecting flannel network")
+            self._detect_flannel_network()
+    
     def is_flannel_ip(self, ip: str) -> bool:
         """Check if an IP address is in the flannel network."""
         if self.flannel_network is None:
             return False
             
-        try:
-            ip_obj = ipaddress.IPv4Address(ip)
-            return ip_obj in self.flannel_network
-        except ValueError:
-            return False
-    
-    def get_container_networks(self) -> Dict[str, Dict[str, Set[str]]]:
-        """Get updated container network information."""
-        container_networks = {}
-        
-        try:
-            for container in self.docker_client.containers.list():
-                networks = container.attrs['NetworkSettings']['Networks']
-                container_networks[container.name] = {}
-                
-                for network_name, network_config in networks.items():
-                    ip = network_config.get('IPAddress', '')
-                    if ip:
-                        if network_name not in container_networks[container.name]:
-                            container_networks[container.name][network_name] = set()
-                        container_networks[container.name][network_name].add(ip)
-        except Exception as e:
-            logger.error(f"Error getting container networks: {e}")
-            
-        return container_networks
+        # Container IPs repeat across syncs, so the result is memoized
+        return _ip_in_range(self._flannel_lo, self._flannel_hi, ip)
     
     def get_container_networks(self) -> Dict[str, Dict[str, str]]:
         """
@@ -99,21 +176,100 @@ class ContainerMonitor:
         Returns:
             Dict mapping container names to dicts of {network_name: ip_address}
         """
-        container_networks = {}
+        if self._state is not None:
+            try:
+                self._refresh_stale_containers()
+            except Exception as e:
+                logger.warning(f"Failed to inspect changed containers, will re-list: {e}")
+                self._state = None
+                
+        if self._state is None:
+            try:
+                self._seed_state()
+            except Exception as e:
+                logger.error(f"Error getting container networks: {e}")
+                return {}
+            
+        # Network dicts are replaced, never mutated, so they can be shared
+        return {name: networks for name, networks in self._state.values()}
+    
+    @staticmethod
+    def _networks_from_attrs(attrs: Dict[str, Any]) -> Dict[str, str]:
+        """Extract {network_name: ip_address} from container list or inspect data."""
+        networks = attrs['NetworkSettings']['Networks']
+        return {network_name: network_config['IPAddress']
+                for network_name, network_config in networks.items()
+                if network_config.get('IPAddress')}
+    
+    def _seed_state(self) -> None:
+        """Build the container state from one full listing of running containers."""
+        # The low-level listing already carries each container's network
+        # settings; containers.list() would inspect every container again
+        state = {}
+        for container in self.docker_client.api.containers():
+            # Legacy links add "/other/alias" names; the own name has one slash
+            names = container['Names']
+            name = next((n[1:] for n in names if n.count('/') == 1), names[0].lstrip('/'))
+            state[container['Id']] = (name, self._networks_from_attrs(container))
         
+        self._state = state
+        # The listing is newer than any pending inspect
+        self._stale_containers.clear()
+        logger.debug("Container state seeded with %d containers", len(state))
+    
+    def _apply_event(self, event: Dict[str, Any]) -> None:
+        """Update the container state for one container or network event."""
+        if self._state is None:
+            # The next sync seeds the full state, which includes this change
+            return
+            
+        action = event.get('Action')
+        if event.get('Type') == 'network':
+            container_id = event['Actor']['Attributes'].get('container')
+            if container_id not in self._state and container_id not in self._stale_containers:
+                return
+        else:
+            container_id = event['Actor'].get('ID')
+            
+        if action in ('die', 'destroy'):
+            self._state.pop(container_id, None)
+            self._stale_containers.discard(container_id)
+        elif action in ('start', 'rename', 'connect', 'disconnect'):
+            # Inspected in one batch when the debounced sync runs
+            self._stale_containers.add(container_id)
+    
+    def _inspect_container(self, container_id: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Return (name, networks) for a running container, or None if it is gone or stopped."""
         try:
-            for container in self.docker_client.containers.list():
-                networks = container.attrs['NetworkSettings']['Networks']
-                container_networks[container.name] = {}
-                
-                for network_name, network_config in networks.items():
-                    ip = network_config.get('IPAddress', '')
-                    if ip:
-                        container_networks[container.name][network_name] = ip
-        except Exception as e:
-            logger.error(f"Error getting container networks: {e}")
+            attrs = self.docker_client.api.inspect_container(container_id)
+        except docker.errors.NotFound:
+            return None
+        if not attrs['State'].get('Running'):
+            return None
+        return attrs['Name'].lstrip('/'), self._networks_from_attrs(attrs)
+    
+    def _refresh_stale_containers(self) -> None:
+        """Inspect the containers changed by events since the last sync, concurrently."""
+        if not self._stale_containers:
+            return
             
-        return container_networks
+        container_ids = list(self._stale_containers)
+        self._stale_containers.clear()
+        
+        if len(container_ids) == 1:
+            results = [self._inspect_container(container_ids[0])]
+        else:
+            # Each inspect is a round trip to dockerd; overlap them on the
+            # connections the event stream leaves free in the pool
+            workers = min(self.DOCKER_POOL_SIZE - 1, len(container_ids))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._inspect_container, container_ids))
+        
+        for container_id, entry in zip(container_ids, results):
+            if entry is None:
+                self._state.pop(container_id, None)
+            else:
+                self._state[container_id] = entry
     
     def prepare_dns_updates(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
@@ -159,14 +315,6 @@ class ContainerMonitor:
                     'ip': ip,
                     'network_name': network_name
                 })
-                
-                # Also add to flannel domain if appropriate
-                if self.is_flannel_ip(ip):
-                    entries_to_add.append({
-                        'hostname': container,
-                        'ip': ip,
-                        'network_name': 'flannel'
-                    })
         
         # Process removed containers - these will be handled by the DNS manager
         entries_to_remove.extend([{'hostname': container} for container in changes['removed_containers']])
@@ -180,14 +328,6 @@ class ContainerMonitor:
                     'ip': ip,
                     'network_name': network_name
                 })
-                
-                # Also add to flannel domain if appropriate
-                if self.is_flannel_ip(ip):
-                    entries_to_add.append({
-                        'hostname': container,
-                        'ip': ip,
-                        'network_name': 'flannel'
-                    })
             
             # Remove obsolete networks
             for network_name, ip in network_changes['removed'].items():
@@ -197,17 +337,21 @@ class ContainerMonitor:
                     'ip': ip,
                     'network_name': network_name
                 })
-                
-                # Also remove from flannel domain if appropriate
-                if self.is_flannel_ip(ip):
-                    entries_to_remove.append({
-                        'hostname': container,
-                        'ip': ip,
-                        'network_name': 'flannel'
-                    })
+        
+        # Mirror flannel addresses into the flannel domain in one pass over
+        # the collected entries; nothing to check without a flannel network
+        if self.flannel_network is not None:
+            entries_to_add.extend(self._flannel_entries(entries_to_add))
+            entries_to_remove.extend(self._flannel_entries(entries_to_remove))
         
         return entries_to_add, entries_to_remove
     
+    def _flannel_entries(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return flannel-domain copies of the entries whose IP is in the flannel network."""
+        is_flannel_ip = self.is_flannel_ip
+        return [{'hostname': entry['hostname'], 'ip': entry['ip'], 'network_name': 'flannel'}
+                for entry in entries if 'ip' in entry and is_flannel_ip(entry['ip'])]
+    
     def sync_dns_entries(self) -> bool:
         """
         Synchronize DNS entries with current container state.
@@ -217,6 +361,9 @@ class ContainerMonitor:
         """
         logger.info("Starting DNS synchronization")
         
+        # One stat per sync keeps the flannel range current
+        self._refresh_flannel_network()
+        
         # Prepare additions and removals
         entries_to_add, entries_to_remove = self.prepare_dns_updates()
         
@@ -237,60 +384,155 @@ class ContainerMonitor:
         return changes_made
     
     def listen_for_events(self):
-        """Listen for Docker events and update DNS accordingly."""
+        """Listen for Docker events and update DNS accordingly, reconnecting as needed."""
+        attempt = 0
+        while True:
+            started = time.time()
+            try:
+                self._listen_until_disconnected()
+                logger.warning("Docker event stream ended unexpectedly, reconnecting")
+            except Exception as e:
+                logger.error(f"Event listener error: {e}")
+            
+            # A connection that held for a while starts the backoff over
+            if time.time() - started > self.RECONNECT_MAX_DELAY:
+                attempt = 0
+            attempt = self._reconnect(attempt)
+    
+    def _reconnect(self, attempt: int) -> int:
+        """
+        Reconnect to Docker with exponential backoff until it succeeds.
+        
+        Returns:
+            int: The attempt count to continue the backoff from
+        """
+        while True:
+            delay = min(self.RECONNECT_MAX_DELAY, self.RECONNECT_DELAY * 2 ** attempt)
+            attempt += 1
+            logger.info(f"Reconnecting to Docker in {delay}s (attempt {attempt})")
+            time.sleep(delay)
+            try:
+                self._connect_to_docker()
+                return attempt
+            except docker.errors.DockerException:
+                # Already logged by _connect_to_docker
+                continue
+    
+    def _listen_until_disconnected(self) -> None:
+        """Sync, then process Docker events and timers until the event stream ends."""
         logger.info("Starting Docker event listener")
         logger.info(f"Using sync interval: {self.sync_interval}s, cleanup interval: {self.cleanup_interval}s")
         
         last_sync_time = 0
         last_cleanup_time = 0
-        changes_detected = False
         
-        # Initial synchronization
-        self.sync_dns_entries()
-        last_sync_time = time.time()
+        # Container events waiting for the next sync
+        pending_events = deque()
+        flush_at = float('inf')
         
-        # Run cleanup on startup if configured
-        if os.environ.get('CLEANUP_ON_STARTUP', 'true').lower() == 'true':
-            logger.info("Performing initial cleanup")
-            self.dns_manager.cleanup_dns_records()
-            last_cleanup_time = time.time()
+        # Subscribe before the initial sync seeds the container state, so no
+        # change made while the listing runs is missed
+        stream, events = self._start_event_reader()
         
         try:
-            for event in self.docker_client.events(decode=True):
+            # Initial synchronization
+            self.sync_dns_entries()
+            last_sync_time = time.time()
+            
+            # Run cleanup on startup if configured
+            if os.environ.get('CLEANUP_ON_STARTUP', 'true').lower() == 'true':
+                logger.info("Performing initial cleanup")
+                self.dns_manager.cleanup_dns_records()
+                last_cleanup_time = time.time()
+            
+            while True:
+                # Wake for the next event or the next timer, whichever comes
+                # first, so periodic work doesn't wait for container activity
+                next_due = min(last_sync_time + self.sync_interval,
+                               last_cleanup_time + self.cleanup_interval,
+                               flush_at)
+                try:
+                    event = events.get(timeout=max(0.0, next_due - time.time()))
+                except queue.Empty:
+                    event = {}
+                
+                if event is None:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+                
                 current_time = time.time()
                 
-                # Process container events that affect networking
-                if event.get('Type') == 'container' and event.get('Action') in ['start', 'die', 'destroy', 'create']:
-                    container_name = event['Actor']['Attributes'].get('name', 'unknown')
-                    logger.info(f"Container event: {event.get('Action')} - {container_name}")
-                    changes_detected = True
+                # Process container and network events that affect networking
+                event_type = event.get('Type')
+                if ((event_type == 'container' and event.get('Action') in self.CONTAINER_ACTIONS)
+                        or (event_type == 'network' and event.get('Action') in self.NETWORK_ACTIONS)):
+                    actor_name = event['Actor']['Attributes'].get('name', 'unknown')
+                    logger.info(f"{event_type.capitalize()} event: {event.get('Action')} - {actor_name}")
+                    self._apply_event(event)
+                    
+                    if not pending_events:
+                        first_event_time = current_time
+                    pending_events.append(event)
+                    flush_at = min(current_time + self.EVENT_DEBOUNCE,
+                                   first_event_time + self.EVENT_MAX_DELAY)
                 
-                # Check if it's time for periodic sync
-                if current_time - last_sync_time > self.sync_interval:
+                # Sync once for a settled burst of events, otherwise periodically
+                if pending_events and (current_time >= flush_at or len(pending_events) >= self.MAX_BATCH):
+                    logger.info(f"Syncing after {len(pending_events)} Docker event(s)")
+                    sync_due = True
+                elif current_time - last_sync_time >= self.sync_interval:
                     logger.info(f"Periodic sync after {self.sync_interval}s")
-                    
+                    # Re-list all containers so a missed or unhandled event
+                    # cannot leave the state drifting until the next reconnect
+                    self._state = None
+                    sync_due = True
+                else:
+                    sync_due = False
+                
+                if sync_due:
                     # Perform the sync - reconfiguration happens inside if changes were made
                     self.sync_dns_entries()
                     
-                    # Reset state for next cycle
+                    # Reset state for next cycle; the sync covers pending events
                     last_sync_time = current_time
-                    changes_detected = False
+                    pending_events.clear()
+                    flush_at = float('inf')
                         
                 # Periodic cleanup of duplicate DNS records
-                if current_time - last_cleanup_time > self.cleanup_interval:
+                if current_time - last_cleanup_time >= self.cleanup_interval:
                     logger.info(f"Periodic DNS cleanup after {(current_time - last_cleanup_time)/3600:.1f}h")
                     self.dns_manager.cleanup_dns_records()
                     last_cleanup_time = current_time
-                        
-            # The for loop will exit if the Docker event stream ends
-            logger.warning("Docker event stream ended unexpectedly, reconnecting")
-            time.sleep(5)
-            self._connect_to_docker()
-            return self.listen_for_events()
-                        
-        except Exception as e:
-            logger.error(f"Event listener error: {e}")
-            # Try to reconnect
-            time.sleep(5)
-            self._connect_to_docker()
-            return self.listen_for_events()
+        finally:
+            # Unblocks the reader thread so it exits and frees its connection
+            # to the Docker socket before the next listener starts
+            stream.close()
+    
+    def _start_event_reader(self) -> Tuple[Any, "queue.Queue"]:
+        """
+        Read the blocking Docker event stream on a daemon thread.
+        
+        Returns the stream, which the caller must close to stop the thread,
+        and a queue. Events are put on the queue, followed by None when the
+        stream ends or by the exception that stopped it.
+        """
+        events = queue.Queue()
+        stream = self.docker_client.events(decode=False, filters=self.EVENT_FILTERS)
+        
+        def read_events():
+            try:
+                # dockerd writes one JSON object per line, but a chunk may
+                # end mid-line, so keep the partial tail for the next chunk
+                buffer = b''
+                for chunk in stream:
+                    *lines, buffer = (buffer + chunk).split(b'\n')
+                    for line in lines:
+                        if line.strip():
+                            events.put(loads_json(line))
+                events.put(None)
+            except Exception as e:
+                events.put(e)
+        
+        threading.Thread(target=read_events, name='docker-events', daemon=True).start()
+        return stream, events
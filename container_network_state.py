@@ -4,10 +4,10 @@ Module for tracking container network states and detecting changes.
 This implements a set-based approach to manage container IP addresses
 and avoid unnecessary DNS updates.
 """
+import sys
 import time
 import logging
-import copy
-from typing import Dict, Set, List, Any, Optional, Tuple
+from typing import Dict, Set, Any, Optional
 
 # Get module logger
 logger = logging.getLogger('dns_updater.state')
@@ -28,21 +28,30 @@ class ContainerNetworkState:
         # Previous state for comparison: {container_name: {network_name: ip_address}}
         self.previous_networks: Dict[str, Dict[str, str]] = {}
         
-        # Track containers that no longer exist: {container_name: cycles_gone}
+        # Track containers that no longer exist: {container_name: cycle_last_seen}
         self.gone_containers: Dict[str, int] = {}
         
+        # Number of update_state calls so far
+        self._cycle = 0
+        
         # Configuration
         self.cleanup_cycles = cleanup_cycles
         
         # Track when changes occurred
         self.last_change_time = 0
         
+        # get_changes() result for the current state pair, set by update_state
+        self._changes: Optional[Dict[str, Any]] = None
+        
         logger.info(f"Container network state tracker initialized (cleanup after {cleanup_cycles} cycles)")
     
     def update_state(self, new_networks: Dict[str, Dict[str, str]]) -> bool:
         """
         Update the network state with new information.
         
+        The outer and per-container dicts are copied, so the caller may
+        reuse new_networks afterwards; the state never mutates them itself.
+        
         Args:
             new_networks: New container network state {container: {network: ip}}
             
@@ -53,96 +62,106 @@ class ContainerNetworkState:
             logger.warning("Invalid network state update: None provided")
             return False
             
-        # Store previous state for comparison
-        self.previous_networks = copy.deepcopy(self.container_networks)
+        # Fast path for idle cycles: dict equality runs in C and skips the
+        # copies and the diff below
+        if new_networks == self.container_networks:
+            self.previous_networks = self.container_networks
+            self._changes = {'added_containers': [], 'removed_containers': [], 'network_changes': {}}
+            self._track_gone_containers(new_networks.keys(), ())
+            logger.debug("No real network changes detected")
+            return False
+            
+        # Store previous state for comparison; the old dict is replaced
+        # below and nothing else holds it, so it is handed over as is
+        self.previous_networks = previous = self.container_networks
         
         # Update with new state
-        self.container_networks = copy.deepcopy(new_networks)
+        self.container_networks = self._clone_networks(new_networks)
+        
+        # Work out the changes in the same pass that detects them
+        self._changes = changes = self._diff(previous, self.container_networks)
         
         # Identify containers that have disappeared
-        self._track_gone_containers(new_networks)
+        self._track_gone_containers(new_networks.keys(), changes['removed_containers'])
+        
+        # With plain IP string values, unequal dicts always mean a real change
+        logger.debug("Container network state changed: %d added, %d removed, %d modified",
+                     len(changes['added_containers']), len(changes['removed_containers']),
+                     len(changes['network_changes']))
+        self.last_change_time = time.time()
+        return True
+    
+    @staticmethod
+    def _clone_networks(networks: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+        """
+        Copy a {container: {network: ip}} state.
         
-        # Check if there were real changes
-        changes = self._has_real_changes()
-        if changes:
-            self.last_change_time = time.time()
-            return True
+        One level of copying is all a deep copy would do, because the IP
+        values are immutable strings. The same names recur every cycle, so
+        they are interned and the stored state shares one string per name
+        instead of holding the fresh copies decoded from each Docker
+        response.
+        """
+        intern = sys.intern
+        return {
+            intern(container): {intern(network): ip for network, ip in container_networks.items()}
+            for container, container_networks in networks.items()
+        }
+    
+    @staticmethod
+    def _diff(previous: Dict[str, Dict[str, str]], current: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+        """Compute the get_changes() result for two states in one pass over the current one."""
+        added_containers = []
+        network_changes = {}  # {container: {'added': {network: ip}, 'removed': {network: ip}}}
+        
+        for container, networks in current.items():
+            previous_container_networks = previous.get(container)
+            if previous_container_networks is None:
+                added_containers.append(container)
+            elif networks != previous_container_networks:
+                network_changes[container] = {
+                    # New networks and changed IPs
+                    'added': {network: ip for network, ip in networks.items()
+                              if previous_container_networks.get(network) != ip},
+                    # Networks the container left
+                    'removed': {network: ip for network, ip in previous_container_networks.items()
+                                if network not in networks}
+                }
         
-        return False
+        return {
+            'added_containers': added_containers,
+            'removed_containers': list(previous.keys() - current.keys()),
+            'network_changes': network_changes
+        }
     
-    def _track_gone_containers(self, new_networks: Dict[str, Dict[str, str]]) -> None:
+    def _track_gone_containers(self, current_containers, newly_gone) -> None:
         """
         Track containers that have disappeared to clean them up later.
         
         Args:
-            new_networks: New container network state
+            current_containers: Container names present in this cycle
+            newly_gone: Containers that disappeared this cycle
         """
-        # Identify containers that are gone in this cycle
-        current_containers = set(new_networks.keys())
-        previous_containers = set(self.previous_networks.keys())
-        
-        # New containers that disappeared this cycle
-        newly_gone = previous_containers - current_containers
+        self._cycle += 1
         
-        # Update gone counter for containers that are still gone
-        for container in list(self.gone_containers.keys()):
+        # How long a container has been gone follows from the cycle it was
+        # last seen in, so entries only change when a container comes back
+        # or is cleaned up
+        for container, last_seen in list(self.gone_containers.items()):
             if container in current_containers:
-                # Container is back, remove from gone list
+                # Container is back, drop it from the gone list
                 del self.gone_containers[container]
-            else:
-                # Container is still gone, increment counter
-                self.gone_containers[container] += 1
-                
-                # Clean up if container has been gone too long
-                if self.gone_containers[container] >= self.cleanup_cycles:
-                    logger.info(f"Cleaning up state for container {container} after {self.cleanup_cycles} cycles")
-                    del self.gone_containers[container]
-        
-        # Add newly gone containers to tracking
+            elif self._cycle - last_seen >= self.cleanup_cycles:
+                # Clean up if it has been gone too long
+                logger.info(f"Cleaning up state for container {container} after {self.cleanup_cycles} cycles")
+                del self.gone_containers[container]
+        
+        # Add newly gone containers to tracking; they were last seen in the
+        # previous cycle
         for container in newly_gone:
-            self.gone_containers[container] = 1
+            self.gone_containers[container] = self._cycle - 1
             logger.debug(f"Container {container} not present in current cycle")
     
-    def _has_real_changes(self) -> bool:
-        """
-        Determine if there were real changes to the network state.
-        
-        Returns:
-            bool: True if there were real changes, False otherwise
-        """
-        # Check for new or removed containers
-        current_containers = set(self.container_networks.keys())
-        previous_containers = set(self.previous_networks.keys())
-        
-        if current_containers != previous_containers:
-            logger.info(f"Container set changed: {len(current_containers)} current, {len(previous_containers)} previous")
-            return True
-            
-        # Check for changes in network configuration
-        for container, networks in self.container_networks.items():
-            # This shouldn't happen, but check anyway
-            if container not in self.previous_networks:
-                logger.info(f"New container detected: {container}")
-                return True
-                
-            previous_container_networks = self.previous_networks[container]
-            
-            # Check for new or removed networks
-            if set(networks.keys()) != set(previous_container_networks.keys()):
-                logger.info(f"Network configuration changed for {container}")
-                return True
-                
-            # Check for IP changes in existing networks
-            for network, ip in networks.items():
-                if (network in previous_container_networks and 
-                    ip != previous_container_networks[network]):
-                    logger.info(f"IP changed for {container} on network {network}: "
-                              f"{previous_container_networks[network]} -> {ip}")
-                    return True
-        
-        logger.debug("No real network changes detected")
-        return False
-    
     def get_changes(self) -> Dict[str, Any]:
         """
         Get the specific changes between current and previous state.
@@ -152,45 +171,14 @@ class ContainerNetworkState:
             - 'added_containers': List of new containers
             - 'removed_containers': List of removed containers
             - 'network_changes': Dict of network changes per container
-        """
-        changes = {
-            'added_containers': [],
-            'removed_containers': [],
-            'network_changes': {}  # {container: {'added': {network: ip}, 'removed': {network: ip}}}
-        }
-        
-        # Find added and removed containers
-        current_containers = set(self.container_networks.keys())
-        previous_containers = set(self.previous_networks.keys())
-        
-        changes['added_containers'] = list(current_containers - previous_containers)
-        changes['removed_containers'] = list(previous_containers - current_containers)
-        
-        # Find network changes for existing containers
-        for container in current_containers & previous_containers:
-            current_networks = self.container_networks[container]
-            previous_networks = self.previous_networks[container]
-            
-            # Skip if no changes
-            if current_networks == previous_networks:
-                continue
-                
-            changes['network_changes'][container] = {
-                'added': {},
-                'removed': {}
-            }
             
-            # Find added networks/IPs
-            for network, ip in current_networks.items():
-                if network not in previous_networks or previous_networks[network] != ip:
-                    changes['network_changes'][container]['added'][network] = ip
-            
-            # Find removed networks/IPs
-            for network, ip in previous_networks.items():
-                if network not in current_networks:
-                    changes['network_changes'][container]['removed'][network] = ip
-        
-        return changes
+        The result is computed by update_state and shared by all callers,
+        so callers must not modify it.
+        """
+        if self._changes is None:
+            # No update yet
+            self._changes = self._diff(self.previous_networks, self.container_networks)
+        return self._changes
     
     def get_all_container_ips(self) -> Dict[str, Set[str]]:
         """
@@ -202,12 +190,8 @@ class ContainerNetworkState:
         result: Dict[str, Set[str]] = {}
         
         for container, networks in self.container_networks.items():
-            if container not in result:
-                result[container] = set()
-                
-            for network, ip in networks.items():
-                if ip:  # Only add non-empty IPs
-                    result[container].add(ip)
+            # Only add non-empty IPs
+            result[container] = {ip for ip in networks.values() if ip}
         
         return result
     
@@ -219,19 +203,21 @@ class ContainerNetworkState:
             Dict with statistics about containers, networks, and IPs
         """
         container_count = len(self.container_networks)
-        network_counts = {}
         ip_count = 0
+        multi_network_containers = 0
         
-        for container, networks in self.container_networks.items():
+        # One pass with plain counters; each network entry holds one IP
+        for networks in self.container_networks.values():
             network_count = len(networks)
-            network_counts[container] = network_count
             ip_count += network_count
+            if network_count > 1:
+                multi_network_containers += 1
         
         return {
             'container_count': container_count,
-            'total_networks': sum(network_counts.values()),
+            'total_networks': ip_count,
             'total_ips': ip_count,
-            'multi_network_containers': sum(1 for count in network_counts.values() if count > 1),
+            'multi_network_containers': multi_network_containers,
             'gone_containers': len(self.gone_containers),
             'last_change': self.last_change_time
         }
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 # analyze-dns-updater-logs.py - Count reconfiguration and timeout events
+import os
 import re
 import sys
+import mmap
+import bisect
 from datetime import datetime, timedelta
 import collections
 
@@ -18,6 +21,24 @@ ERROR_PATTERN = r"ERROR"
 REMOVE_PATTERN = r"Failed to remove DNS entry"
 GET_ENTRIES_PATTERN = r"Failed to get DNS entries"
 
+# All event patterns in one alternation, so the log is scanned once; matched
+# against the raw bytes so nothing is decoded
+EVENT_PATTERN = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in (
+    ("reconfig", RECONFIG_PATTERN),
+    ("restart", RESTART_PATTERN),
+    ("timeout", TIMEOUT_PATTERN),
+    ("error", ERROR_PATTERN),
+    ("remove", REMOVE_PATTERN),
+    ("get", GET_ENTRIES_PATTERN),
+)).encode())
+
+TIMESTAMP_PATTERN = re.compile(rb"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
+
+def parse_timestamp(text):
+    """Parse a fixed-layout 'YYYY-MM-DD HH:MM:SS' string or bytes; much faster than strptime."""
+    return datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                    int(text[11:13]), int(text[14:16]), int(text[17:19]))
+
 # Counters
 reconfig_times = []
 restart_times = []
@@ -26,29 +47,45 @@ error_times = []
 remove_times = []
 get_times = []
 
-# Parse log file
-with open(LOG_FILE, 'r') as f:
-    for line in f:
-        # Extract timestamp
-        match = re.search(r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})", line)
-        if not match:
+event_times_by_name = {
+    "reconfig": reconfig_times,
+    "restart": restart_times,
+    "timeout": timeout_times,
+    "error": error_times,
+    "remove": remove_times,
+    "get": get_times,
+}
+
+# Parse log file: scan the memory-mapped bytes for events and only look at
+# the lines that contain one
+def scan_log(log_data):
+    last_line_start = -1
+    last_timestamp_text = None
+    for event in EVENT_PATTERN.finditer(log_data):
+        line_start = log_data.rfind(b"\n", 0, event.start()) + 1
+        if line_start != last_line_start:
+            # First event on this line: extract its timestamp
+            last_line_start = line_start
+            line_events = set()
+            line_end = log_data.find(b"\n", event.end())
+            match = TIMESTAMP_PATTERN.search(log_data, line_start, line_end if line_end >= 0 else len(log_data))
+            if match and match.group(1) != last_timestamp_text:
+                # Consecutive lines usually share a timestamp; only parse new ones
+                last_timestamp_text = match.group(1)
+                timestamp = parse_timestamp(last_timestamp_text)
+
+        # A line can contain several events (e.g. an ERROR line for a curl
+        # timeout), each counted once
+        if not match or event.lastgroup in line_events:
             continue
-            
-        timestamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
-        
-        # Check for events
-        if re.search(RECONFIG_PATTERN, line):
-            reconfig_times.append(timestamp)
-        if re.search(RESTART_PATTERN, line):
-            restart_times.append(timestamp)
-        if re.search(TIMEOUT_PATTERN, line):
-            timeout_times.append(timestamp)
-        if re.search(ERROR_PATTERN, line):
-            error_times.append(timestamp)
-        if re.search(REMOVE_PATTERN, line):
-            remove_times.append(timestamp)
-        if re.search(GET_ENTRIES_PATTERN, line):
-            get_times.append(timestamp)
+        line_events.add(event.lastgroup)
+        event_times_by_name[event.lastgroup].append(timestamp)
+
+with open(LOG_FILE, 'rb') as f:
+    # mmap cannot map an empty file
+    if os.fstat(f.fileno()).st_size:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log_data:
+            scan_log(log_data)
 
 # Calculate events per hour
 def events_per_hour(event_times):
@@ -76,10 +113,7 @@ def events_per_minute(event_times):
         return []
         
     # Create minute buckets
-    minute_counts = collections.defaultdict(int)
-    for t in event_times:
-        minute_key = t.replace(second=0, microsecond=0)
-        minute_counts[minute_key] += 1
+    minute_counts = collections.Counter(t.replace(second=0, microsecond=0) for t in event_times)
         
     return sorted(minute_counts.items())
 
@@ -88,12 +122,7 @@ def calculate_intervals(event_times):
     if len(event_times) < 2:
         return []
         
-    intervals = []
-    for i in range(1, len(event_times)):
-        interval = (event_times[i] - event_times[i-1]).total_seconds()
-        intervals.append(interval)
-        
-    return intervals
+    return [(later - earlier).total_seconds() for earlier, later in zip(event_times, event_times[1:])]
 
 # Print summary
 print(f"Log Analysis Summary for {LOG_FILE}")
@@ -133,19 +162,13 @@ if timeout_times:
         
         # Distribution of intervals
         brackets = [0, 30, 60, 120, 300, 600]
-        counts = [0] * (len(brackets))
-        
-        for interval in timeout_intervals:
-            for i, threshold in enumerate(brackets):
-                if interval >= threshold:
-                    counts[i] += 1
-                else:
-                    break
+        # Index of the bracket each interval falls in, found by binary search
+        counts = collections.Counter(bisect.bisect_right(brackets, interval) - 1 for interval in timeout_intervals)
         
         print("\nInterval distribution:")
         for i in range(len(brackets)-1):
-            print(f"  {brackets[i]}-{brackets[i+1]}s: {counts[i] - counts[i+1]}")
-        print(f"  600+s: {counts[-1]}")
+            print(f"  {brackets[i]}-{brackets[i+1]}s: {counts[i]}")
+        print(f"  600+s: {counts[len(brackets)-1]}")
     
     # Show minute-by-minute events
     timeout_by_minute = events_per_minute(timeout_times)
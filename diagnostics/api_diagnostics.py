@@ -6,6 +6,7 @@ import sys
 import importlib.util
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(
@@ -62,6 +63,13 @@ def check_module_content(module_name):
         logger.error(f"  - Error checking module content: {e}")
         return False
 
+def _preload_module(module_name):
+    """Import a module ahead of its check; failures are reported by the check itself."""
+    try:
+        importlib.import_module(module_name)
+    except Exception:
+        pass
+
 def check_api_modules():
     """Check if all API client modules are available."""
     modules = [
@@ -73,11 +81,19 @@ def check_api_modules():
     
     logger.info("Checking API client modules:")
     
+    # Find and import the modules concurrently up front: import locks are
+    # per module, so the file system work of the imports overlaps. The
+    # checks below then run in order on the loaded modules, so each
+    # module's log lines stay together.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        available = dict(zip(modules, executor.map(check_module_exists, modules)))
+        list(executor.map(_preload_module, [m for m in modules if available[m]]))
+    
     all_available = True
     module_statuses = {}
     
     for module_name in modules:
-        exists = check_module_exists(module_name)
+        exists = available[module_name]
         logger.info(f"Module {module_name}: {'Available' if exists else 'Not Available'}")
         
         if exists:
@@ -33,6 +33,10 @@ def check_import(module_name, class_name=None):
         traceback.print_exc()
         return False
 
+def third_party(dependencies):
+    """Drop standard library modules, which are always importable."""
+    return [dep for dep in dependencies if dep not in sys.stdlib_module_names]
+
 def check_api_client_requests():
     """Check api_client_requests and its dependencies."""
     logger.info("Checking api_client_requests.py dependencies:")
@@ -41,7 +45,7 @@ def check_api_client_requests():
     dependencies = ['os', 'time', 'socket', 'logging', 'json', 'requests', 'typing']
     missing = []
     
-    for dep in dependencies:
+    for dep in third_party(dependencies):
         if not check_import(dep):
             missing.append(dep)
     
@@ -80,7 +84,7 @@ def check_api_client_alt():
     dependencies = ['os', 'time', 'json', 'logging', 'subprocess', 'typing', 're']
     missing = []
     
-    for dep in dependencies:
+    for dep in third_party(dependencies):
         if not check_import(dep):
             missing.append(dep)
     
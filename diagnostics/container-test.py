@@ -3,6 +3,14 @@ import subprocess
 import time
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Run probes concurrently; each returns its output lines, which are printed
+# in order once all have finished so the reports do not interleave
+def run_probes(probe, items):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for lines in executor.map(lambda item: probe(*item), items):
+            print("\n".join(lines))
 
 # Test network connectivity
 def test_connectivity():
@@ -12,43 +20,47 @@ def test_connectivity():
         ("API", "https://lavash.7homas.com/api/core/firmware/status")
     ]
     
-    for name, target in targets:
-        start = time.time()
-        print(f"Testing {name} connectivity to {target}...")
-        
-        if name == "DNS":
-            # Test DNS resolution
-            try:
-                result = subprocess.run(["nslookup", target], 
-                                      capture_output=True, text=True, timeout=5)
-                elapsed = time.time() - start
-                if result.returncode == 0 and "Address:" in result.stdout:
-                    print(f"  Success: DNS resolved in {elapsed:.2f}s")
-                    print(f"  {result.stdout.strip().split('Address:')[-1].strip()}")
-                else:
-                    print(f"  Failed: DNS resolution failed in {elapsed:.2f}s")
-                    print(f"  {result.stderr}")
-            except Exception as e:
-                elapsed = time.time() - start
-                print(f"  Error: {str(e)} after {elapsed:.2f}s")
-        else:
-            # Test HTTP connectivity
-            try:
-                result = subprocess.run(["curl", "-s", "-k", "--connect-timeout", "5", 
-                                       "-m", "10", "-w", "%{http_code}", "-o", "/dev/null", 
-                                       target], 
-                                      capture_output=True, text=True, timeout=15)
-                elapsed = time.time() - start
-                
-                if result.returncode == 0 and result.stdout.strip() == "200":
-                    print(f"  Success: API connection in {elapsed:.2f}s")
-                else:
-                    print(f"  Failed: API connection failed in {elapsed:.2f}s")
-                    print(f"  Status: {result.stdout.strip()}")
-                    print(f"  Error: {result.stderr}")
-            except Exception as e:
-                elapsed = time.time() - start
-                print(f"  Error: {str(e)} after {elapsed:.2f}s")
+    run_probes(_test_target, targets)
+
+def _test_target(name, target):
+    start = time.time()
+    lines = [f"Testing {name} connectivity to {target}..."]
+    
+    if name == "DNS":
+        # Test DNS resolution
+        try:
+            result = subprocess.run(["nslookup", target], 
+                                  capture_output=True, text=True, timeout=5)
+            elapsed = time.time() - start
+            if result.returncode == 0 and "Address:" in result.stdout:
+                lines.append(f"  Success: DNS resolved in {elapsed:.2f}s")
+                lines.append(f"  {result.stdout.strip().split('Address:')[-1].strip()}")
+            else:
+                lines.append(f"  Failed: DNS resolution failed in {elapsed:.2f}s")
+                lines.append(f"  {result.stderr}")
+        except Exception as e:
+            elapsed = time.time() - start
+            lines.append(f"  Error: {str(e)} after {elapsed:.2f}s")
+    else:
+        # Test HTTP connectivity
+        try:
+            result = subprocess.run(["curl", "-s", "-k", "--connect-timeout", "5", 
+                                   "-m", "10", "-w", "%{http_code}", "-o", "/dev/null", 
+                                   target], 
+                                  capture_output=True, text=True, timeout=15)
+            elapsed = time.time() - start
+            
+            if result.returncode == 0 and result.stdout.strip() == "200":
+                lines.append(f"  Success: API connection in {elapsed:.2f}s")
+            else:
+                lines.append(f"  Failed: API connection failed in {elapsed:.2f}s")
+                lines.append(f"  Status: {result.stdout.strip()}")
+                lines.append(f"  Error: {result.stderr}")
+        except Exception as e:
+            elapsed = time.time() - start
+            lines.append(f"  Error: {str(e)} after {elapsed:.2f}s")
+    
+    return lines
 
 # Test HTTP parameters
 def test_http_parameters():
@@ -67,23 +79,27 @@ def test_http_parameters():
                              "https://lavash.7homas.com/api/core/firmware/status"])
     ]
     
-    for name, cmd in tests:
-        start = time.time()
-        print(f"Testing {name} method...")
+    run_probes(_test_method, tests)
+
+def _test_method(name, cmd):
+    start = time.time()
+    lines = [f"Testing {name} method..."]
+    
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
+        elapsed = time.time() - start
         
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
-            elapsed = time.time() - start
-            
-            if result.returncode == 0 and len(result.stdout) > 10:
-                print(f"  Success: Completed in {elapsed:.2f}s")
-                print(f"  Response size: {len(result.stdout)} bytes")
-            else:
-                print(f"  Failed: Completed in {elapsed:.2f}s with code {result.returncode}")
-                print(f"  Error: {result.stderr}")
-        except Exception as e:
-            elapsed = time.time() - start
-            print(f"  Error: {str(e)} after {elapsed:.2f}s")
+        if result.returncode == 0 and len(result.stdout) > 10:
+            lines.append(f"  Success: Completed in {elapsed:.2f}s")
+            lines.append(f"  Response size: {len(result.stdout)} bytes")
+        else:
+            lines.append(f"  Failed: Completed in {elapsed:.2f}s with code {result.returncode}")
+            lines.append(f"  Error: {result.stderr}")
+    except Exception as e:
+        elapsed = time.time() - start
+        lines.append(f"  Error: {str(e)} after {elapsed:.2f}s")
+    
+    return lines
 
 # Print environment information
 def print_environment():
@@ -6,17 +6,52 @@ import sys
 import time
 import json
 import socket
+import threading
 import subprocess
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 import warnings
 
 # Suppress insecure request warnings for clean output
 warnings.filterwarnings("ignore", category=requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
+# Shared session so repeated API probes to the same host reuse connections
+# and TLS sessions; the pool covers every concurrent probe
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# Per-thread log buffer, set while a probe runs in a worker thread
+_probe_output = threading.local()
+
 def log(message):
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    print(f"{timestamp} - {message}")
+    buffer = getattr(_probe_output, 'lines', None)
+    if buffer is not None:
+        buffer.append(f"{timestamp} - {message}")
+    else:
+        print(f"{timestamp} - {message}")
+
+def _run_probe(probe):
+    """Run one probe, capturing its log lines instead of printing them."""
+    _probe_output.lines = []
+    try:
+        return probe(), _probe_output.lines
+    finally:
+        _probe_output.lines = None
+
+def run_probes(probes):
+    """Run independent probes concurrently and print their logs in order."""
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        outcomes = list(executor.map(_run_probe, probes))
+    
+    results = []
+    for result, lines in outcomes:
+        for line in lines:
+            print(line)
+        results.append(result)
+    return results
 
 def run_command(cmd, timeout=10):
     """Run a shell command and return output."""
@@ -69,7 +104,7 @@ def test_api_connection(url, auth=None, verify=True, timeout=10):
     
     try:
         start_time = time.time()
-        response = requests.get(url, auth=auth, verify=verify, timeout=timeout)
+        response = SESSION.get(url, auth=auth, verify=verify, timeout=timeout)
         elapsed = time.time() - start_time
         
         log(f"  Success: API responded in {elapsed:.2f}s (status: {response.status_code})")
@@ -185,48 +220,56 @@ def test_all_configs():
     parsed_url = urlparse(opnsense_url)
     hostname = parsed_url.netloc.split(':')[0]  # Handle port if present
     
-    # Test DNS resolution for the hostname
-    ip = test_dns_resolution(hostname)
-    
-    # Test direct connection to the resolved IP
-    if ip:
-        test_direct_connection(ip, 443)
-    
-    # Test direct connection to known OPNsense IP (likely gateway IP)
-    direct_ip = "192.168.4.1"  # Common gateway IP
-    log(f"Testing direct TCP connection to {direct_ip}:443...")
-    test_direct_connection(direct_ip, 443)
-    
     # Test API connection with the hostname
     base_url = opnsense_url.rstrip('/')
     if not base_url.endswith('/api'):
         base_url += '/api'
     
-    # Test API connection with direct IP
+    direct_ip = "192.168.4.1"  # Common gateway IP (likely OPNsense)
     direct_url = base_url.replace(hostname, direct_ip)
-    status_code, response = test_api_connection(f"{direct_url}/core/firmware/status", auth, False, 5)
     
-    # Test API connection with hostname
-    status_code, response = test_api_connection(f"{base_url}/core/firmware/status", auth, False, 5)
+    # Test DNS resolution for the hostname, then direct connection to the resolved IP
+    def resolve_and_connect():
+        ip = test_dns_resolution(hostname)
+        if ip:
+            test_direct_connection(ip, 443)
     
-    # Test again with longer timeout as fallback
-    if not status_code or status_code >= 400:
-        status_code, response = test_api_connection(f"{base_url}/core/firmware/status", auth, False, 10)
+    # Test direct connection to known OPNsense IP
+    def connect_direct_ip():
+        log(f"Testing direct TCP connection to {direct_ip}:443...")
+        test_direct_connection(direct_ip, 443)
     
-    # Test with curl for comparison
-    status_code, response = test_curl_connection(f"{base_url}/core/firmware/status", auth, False, 5)
+    # Test API connection with hostname, again with longer timeout as fallback
+    def api_via_hostname():
+        status_code, response = test_api_connection(f"{base_url}/core/firmware/status", auth, False, 5)
+        if not status_code or status_code >= 400:
+            test_api_connection(f"{base_url}/core/firmware/status", auth, False, 10)
     
     # Test unbound DNS API endpoints specifically
-    log("Testing Unbound DNS API endpoints...")
-    test_api_connection(f"{direct_url}/unbound/settings/searchHostOverride", auth, False, 5)
+    def unbound_endpoints():
+        log("Testing Unbound DNS API endpoints...")
+        test_api_connection(f"{direct_url}/unbound/settings/searchHostOverride", auth, False, 5)
     
     # Test deletion with a fake ID
-    test_url = f"{direct_url}/unbound/settings/delHostOverride/00000000-0000-0000-0000-000000000000"
-    status_code, response = test_api_connection(test_url, auth, False, 5)
-    log(f"  Delete test response code: {status_code}")
+    def delete_fake_id():
+        test_url = f"{direct_url}/unbound/settings/delHostOverride/00000000-0000-0000-0000-000000000000"
+        status_code, response = test_api_connection(test_url, auth, False, 5)
+        log(f"  Delete test response code: {status_code}")
     
-    # Test DNS command-line tools
-    test_dns_cmd()
+    # The probes are independent, so they run concurrently
+    run_probes([
+        resolve_and_connect,
+        connect_direct_ip,
+        # Test API connection with direct IP
+        lambda: test_api_connection(f"{direct_url}/core/firmware/status", auth, False, 5),
+        api_via_hostname,
+        # Test with curl for comparison
+        lambda: test_curl_connection(f"{base_url}/core/firmware/status", auth, False, 5),
+        unbound_endpoints,
+        delete_fake_id,
+        # Test DNS command-line tools
+        test_dns_cmd,
+    ])
 
 # Main execution
 if __name__ == "__main__":
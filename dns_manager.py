@@ -6,7 +6,7 @@ import json
 import threading
 import subprocess
 import os
-from typing import Dict, List, Set, Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any
 
 # Get module logger
 logger = logging.getLogger('dns_updater.dns')
@@ -198,10 +198,7 @@ class DNSManager:
                 'description': host.get('description', '')
             }
             
-            if hostname not in dns_entries:
-                dns_entries[hostname] = []
-                
-            dns_entries[hostname].append(rec)
+            dns_entries.setdefault(hostname, []).append(rec)
         
         # Cache the result
         self.cache.set('all_dns_entries', dns_entries)
@@ -310,8 +307,7 @@ class DNSManager:
         
         # First pass: identify the latest IP for each hostname/domain
         for hostname, entries in dns_entries.items():
-            if hostname not in hostname_domains:
-                hostname_domains[hostname] = {}
+            domains = hostname_domains.setdefault(hostname, {})
                 
             for entry in entries:
                 domain = entry.get('domain', '')
@@ -319,16 +315,17 @@ class DNSManager:
                 
                 key = f"{hostname}.{domain}"
                 
-                if domain not in hostname_domains[hostname]:
-                    hostname_domains[hostname][domain] = {
+                if domain not in domains:
+                    domains[domain] = {
                         'expected_ip': ip,
                         'count': 1,
                         'entries': [entry]
                     }
                 else:
                     # Add this entry to the list
-                    hostname_domains[hostname][domain]['count'] += 1
-                    hostname_domains[hostname][domain]['entries'].append(entry)
+                    domain_info = domains[domain]
+                    domain_info['count'] += 1
+                    domain_info['entries'].append(entry)
         
         # Second pass: find hostnames with duplicates
         duplicates = []
@@ -503,9 +500,7 @@ class DNSManager:
                 if self.update_dns(hostname, ip, network_name, pre_fetched_entries=all_dns_entries):
                     changes_made = True
                     # Update our local cache of DNS entries
-                    if hostname not in all_dns_entries:
-                        all_dns_entries[hostname] = []
-                    all_dns_entries[hostname].append({
+                    all_dns_entries.setdefault(hostname, []).append({
                         'uuid': 'new', # Placeholder, will be replaced on next fetch
                         'domain': domain,
                         'ip': ip,
@@ -826,9 +821,7 @@ class DNSManager:
                 success_count += 1
                 changes_made = True
                 # Update the all_entries with the new entry to avoid unnecessary fetches
-                if hostname not in all_entries:
-                    all_entries[hostname] = []
-                all_entries[hostname].append({
+                all_entries.setdefault(hostname, []).append({
                     'domain': domain,
                     'ip': ip,
                     'description': f"Docker container on {self.host_name} ({network_name or 'default'})"
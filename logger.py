@@ -45,6 +45,7 @@ def log_startup_info(logger: logging.Logger) -> None:
         'API_TIMEOUT',
         'API_RETRY_COUNT',
         'API_BACKOFF_FACTOR',
+        'API_POOL_MAXSIZE',
         'SOCKET_TIMEOUT',
         'CONNECT_TIMEOUT',
         'READ_TIMEOUT',
@@ -52,11 +53,15 @@ def log_startup_info(logger: logging.Logger) -> None:
         
         # Rate Limiting
         'MIN_RECONFIGURE_INTERVAL',
+        'MIN_CALL_INTERVAL',
+        'API_RATE_BURST',
         'SKIP_RECONFIG_AFTER_DELETE',
         'EMERGENCY_BYPASS_RECONFIG',
         
         # Caching
         'DNS_CACHE_TTL',
+        'DNS_CACHE_MAX_ENTRIES',
+        'DNS_CACHE_FILE',
         
         # Sync and Cleanup Intervals
         'DNS_SYNC_INTERVAL',
@@ -74,7 +79,9 @@ def log_startup_info(logger: logging.Logger) -> None:
         # API Implementation
         'USE_CURL',
         'USE_CURL_FIRST',
-        'STAY_WITH_CURL',
+        'FORCE_CURL',
+        'USE_HTTPX',
+        'USE_HTTP2',
         'FORCE_HTTP1',
         
         # Health Checks